@@ -1,7 +1,10 @@
 import argparse
+import importlib
 from pathlib import Path
 from .export_weights import export
-from .generate_models import generate_models
+from .generate_models import generate_models, models_from_spec
+from .serving import benchmark, rust_model_fn, torch_model_fn
+import torch
 import os
 import sys
 
@@ -18,13 +21,19 @@ def _make_parser() -> argparse.ArgumentParser:
 
     subparsers = parser.add_subparsers(dest="command", required=True)
     export_parser = subparsers.add_parser("export", help="Exports Rust weights for a given Pytorch weight file (.pt ending) that contains a saved model fitting SPEC")
-    generate_parser = subparsers.add_parser("generate", help="Generates model files with the given SPEC. Models are saved for Rust (models.rs) and Python (models.py) under the folder ./models")
+    generate_parser = subparsers.add_parser("generate", help="Generates model files with the given SPEC. Models are saved for Rust (models.rs) and Python (models.py, and models_inference.py for inference from the exported weights) under the folder ./models")
+    benchmark_parser = subparsers.add_parser("benchmark", help="Benchmarks the generated model (by default the Python model in ./models/models.py) behind a request-batching server with a synthetic load")
 
     generate_parser.add_argument(
         "--skip-validation",
         type=bool,
         help="If set to true, does not validate the passed specification with the model jsonschema",
     )
+    generate_parser.add_argument(
+        "--python-bindings",
+        metavar="NAME",
+        help="Additionally generates PyO3 bindings for the Rust models (bindings.rs), to be compiled into the Python extension module NAME",
+    )
 
     export_parser.add_argument(
         "--out",
@@ -33,25 +42,135 @@ def _make_parser() -> argparse.ArgumentParser:
         default="weights.npz",
         help="Name of the file the weights are saved to",
     )
+    export_parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Compresses every weight individually (smaller file, e.g. for delivery to the browser)",
+    )
+    export_parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Removes output channels that are zero or unused by the next layer. Writes the pruned specification to --pruned-spec, the models have to be generated from it",
+    )
+    export_parser.add_argument(
+        "--sparse-threshold",
+        metavar="DENSITY",
+        type=float,
+        help="Exports linear layers with at most this fraction of non-zero weights in sparse format. Writes the changed specification to --pruned-spec, the models have to be generated from it",
+    )
+    export_parser.add_argument(
+        "--pruned-spec",
+        metavar="PRUNED_SPEC",
+        type=Path,
+        help="Name of the file the pruned specification is saved to, default=SPEC with ending .pruned.json",
+    )
     export_parser.add_argument(
         "checkpoint",
         metavar="CHECKPOINT",
         type=Path,
         help="Path to the checkpoint the weights are exported from",
     )
+
+    benchmark_parser.add_argument(
+        "--input-shape",
+        metavar="SHAPE",
+        type=lambda s: tuple(int(d) for d in s.split(",")),
+        required=True,
+        help="Shape of a single (unbatched) input, comma separated, e.g. 1,28,28",
+    )
+    benchmark_parser.add_argument(
+        "--module",
+        help="Name of the module in SPEC that is benchmarked, default=first module",
+    )
+    benchmark_parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="Checkpoint the model is loaded from, default=untrained model",
+    )
+    benchmark_parser.add_argument(
+        "--bindings",
+        metavar="NAME",
+        help="Benchmarks the Rust model from the compiled Python bindings NAME instead (requires --weights)",
+    )
+    benchmark_parser.add_argument(
+        "--weights",
+        type=Path,
+        help="Exported weights (.npz) the Rust model is loaded from",
+    )
+    benchmark_parser.add_argument(
+        "--requests", type=int, default=1000, help="Number of requests that are sent"
+    )
+    benchmark_parser.add_argument(
+        "--concurrency", type=int, default=64, help="Number of clients sending requests"
+    )
+    benchmark_parser.add_argument(
+        "--max-batch-size", type=int, default=32, help="Maximum number of requests in a batch"
+    )
+    benchmark_parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=0.005,
+        help="Maximum time (in seconds) a request waits for further requests to batch with",
+    )
+    benchmark_parser.add_argument(
+        "--workers", type=int, default=1, help="Number of worker threads running batches"
+    )
     return parser
 
 
+def _benchmark(args: argparse.Namespace):
+    """Loads the generated model and benchmarks it with the serving harness."""
+    module_name = args.module or models_from_spec(args.specification)[0].module_name
+    if args.bindings is not None:
+        if args.weights is None:
+            raise ValueError("--bindings requires the exported weights (--weights)")
+        bindings = importlib.import_module(args.bindings)
+        model_fn = rust_model_fn(getattr(bindings, module_name)(str(args.weights)))
+    elif args.checkpoint is not None:
+        model_fn = torch_model_fn(torch.load(args.checkpoint))
+    else:
+        models = importlib.import_module("models.models")
+        model_fn = torch_model_fn(getattr(models, module_name)())
+    summary = benchmark(
+        model_fn,
+        args.input_shape,
+        num_requests=args.requests,
+        concurrency=args.concurrency,
+        max_batch_size=args.max_batch_size,
+        max_delay=args.max_delay,
+        workers=args.workers,
+    )
+    print(f"Benchmark of {module_name}:")
+    for key, value in summary.items():
+        print(f"  {key}: {value:.2f}")
+
+
 def main():
     """Initializes the argument parser and presents the user with a CLI."""
     parser = _make_parser()
     args = parser.parse_args()
     if args.command == "generate":
-        generate_models(args.specification, args.skip_validation)
+        generate_models(
+            args.specification,
+            args.skip_validation,
+            python_bindings=args.python_bindings,
+        )
     elif args.command == "export":
         # caller path
         sys.path.append(os.getcwd())
-        export(args.specification, args.checkpoint, args.out)
+        export(
+            args.specification,
+            args.checkpoint,
+            args.out,
+            args.compress,
+            args.prune,
+            args.sparse_threshold,
+            args.pruned_spec,
+        )
+    elif args.command == "benchmark":
+        # caller path
+        sys.path.append(os.getcwd())
+        _benchmark(args)
     else:
         raise ValueError("Unknown command")
 
@@ -1,39 +1,161 @@
 """
 Exports the weights in a format that Rust can work with (.npz with everything stripped out
-besides weights).
+besides weights). Every weight is packed into the layout that its Rust layer consumes,
+so the Rust side can use the loaded arrays as-is.
 """
+import json
+from pathlib import Path
+from typing import Optional
 import torch
 import numpy as np
 
-from .generate_models import models_from_spec
+from .generate_models import load_specification, models_from_specifications, specification_hash
+from .layers import Model, Weight
+from .manifest import write_manifest
+from .pruning import prune_models
 
-def get_export_keys(spec: str):
+"""Contains the mapping of weight layouts (see Weight.layout) to the functions
+that pack a Pytorch weight into this layout. The generated inference models
+(models_inference.py) undo the packing, so new layouts have to be added there too."""
+LAYOUT_DISPATCH = {
+    "torch": lambda array: array,
+    "transposed": lambda array: array.T,
+    # compressed sparse row representation, numpy returns the non-zeros in row-major order
+    "csr_data": lambda array: array[array != 0],
+    "csr_indices": lambda array: np.nonzero(array)[1].astype(np.int64),
+    "csr_indptr": lambda array: np.concatenate(
+        [[0], np.cumsum(np.count_nonzero(array, axis=1))]
+    ).astype(np.int64),
+}
+
+
+def _export_weights_of(models: list[Model]) -> list[tuple[str, str, Weight]]:
     """
-    Returns the exact weight keys that need to be exported from the model.
-    This removes unnecessary attributes such as training parameters.
+    Returns the key the weight is exported under, the key of the Pytorch weight it
+    is exported from, and the weight itself, for all weights of the models.
     """
-    model_defs = models_from_spec(spec)
-    keys_to_export = []
-    for model in model_defs:
+    weights_to_export = []
+    for model in models:
         for layer in model.layers:
             for weight in layer.weights:
                 if weight is not None:
-                    keys_to_export.append(f"layers.{layer.name}.{weight.name}")
-    return keys_to_export
+                    weights_to_export.append(
+                        (
+                            f"layers.{layer.name}.{weight.name}",
+                            f"layers.{layer.name}.{weight.source}",
+                            weight,
+                        )
+                    )
+    return weights_to_export
+
+
+def fold_batch_norms(
+    models: list[Model], state_dict: dict[str, np.ndarray]
+) -> dict[str, np.ndarray]:
+    """
+    Folds the running statistics and affine parameters of every batch norm into
+    the weight and bias of the layer before it, so that the batch norm does not
+    have to be computed at inference. Returns the folded weights, the given
+    weights are not changed.
+    """
+    state_dict = dict(state_dict)
+    for model in models:
+        layers = {l.name: l for l in model.layers}
+        for node in model.nodes:
+            norm = node.layer
+            if not norm.folds_into_input:
+                continue
+            layer = layers[node.inputs[0].name]
+            norm_key = f"layers.{norm.name}"
+            layer_key = f"layers.{layer.name}"
+
+            mean = state_dict[f"{norm_key}.running_mean"]
+            scale = 1 / np.sqrt(state_dict[f"{norm_key}.running_var"] + norm.eps)
+            # the affine parameters are missing if the batch norm is not affine
+            if f"{norm_key}.weight" in state_dict:
+                scale = scale * state_dict[f"{norm_key}.weight"]
+            shift = state_dict.get(f"{norm_key}.bias", np.zeros_like(mean))
+
+            weight = state_dict[f"{layer_key}.weight"]
+            scale_shape = [1] * weight.ndim
+            scale_shape[layer.out_channel_axis] = -1
+            bias = state_dict.get(f"{layer_key}.bias", np.zeros_like(mean))
+            state_dict[f"{layer_key}.weight"] = weight * scale.reshape(scale_shape)
+            state_dict[f"{layer_key}.bias"] = (bias - mean) * scale + shift
+    return state_dict
 
 
-def export(spec: str, checkpoint: str, out: str):
+def pack_weight(array: np.ndarray, weight: Weight) -> np.ndarray:
+    """
+    Packs the Pytorch array into the layout of the given weight. The result
+    is always C-contiguous, as numpy would otherwise write transposed views
+    in Fortran order.
+    """
+    return np.ascontiguousarray(LAYOUT_DISPATCH[weight.layout](array))
+
+
+def export(
+    spec: str,
+    checkpoint: str,
+    out: str,
+    compress: bool = False,
+    prune: bool = False,
+    sparse_threshold: Optional[float] = None,
+    pruned_spec: Optional[str] = None,
+):
     """
     Loads the model from the given specification, loads the weights
     that are found in the checkpoint, and writes them to the file given by out.
+    If compress is set to true, every weight is compressed individually, so that the
+    Rust loader only has to decompress the weights it actually loads.
+
+    The npz file also contains a manifest of the weights (see manifest.py), that
+    records the hash of the specification the models have to be generated from.
+
+    Batch norms are folded into the layers before them.
+    If prune is set to true, dead channels are removed, and if a sparse_threshold is
+    given, linear layers with at most this fraction of non-zero weights are exported
+    in sparse format (see pruning.py). The specification that fits the pruned weights
+    is written to pruned_spec (default: SPEC with ending .pruned.json), and the
+    models have to be generated from it.
     """
     print("Loading model...")
     model = torch.load(checkpoint)
     # model update populates some important variables,
     # this is why we have to call it here.
-    state_dict = model.state_dict()
+    state_dict = {
+        key: value.detach().cpu().numpy() for key, value in model.state_dict().items()
+    }
+    specifications, spec_hash = load_specification(spec)
+    models = models_from_specifications(specifications, spec_hash)
+    state_dict = fold_batch_norms(models, state_dict)
+
+    if prune or sparse_threshold is not None:
+        specifications, state_dict = prune_models(
+            specifications, state_dict, prune, sparse_threshold
+        )
+        if pruned_spec is None:
+            pruned_spec = Path(spec).with_suffix(".pruned.json")
+        with open(pruned_spec, "w") as pruned_spec_file:
+            json.dump(specifications, pruned_spec_file, indent=4)
+        print(f"Wrote pruned specification to {pruned_spec}, generate the models from it.")
+        models = list(map(Model, specifications))
+        spec_hash = specification_hash(pruned_spec)
 
-    exported_dict = {key: state_dict[key] for key in get_export_keys(spec)}
+    exported_dict = {}
+    for key, source, weight in _export_weights_of(models):
+        exported_dict[key] = pack_weight(state_dict[source], weight)
+        if str(exported_dict[key].shape) != weight.shape:
+            raise ValueError(
+                f"Weight {key} has shape {exported_dict[key].shape}, but the specification expects {weight.shape}."
+            )
     # exported_dict["entropy_bottleneck._medians"] = state_dict["entropy_bottleneck.quantiles"][:, :, 1:2].squeeze()
-    np.savez(out, **exported_dict)
+    if compress:
+        np.savez_compressed(out, **exported_dict)
+    else:
+        np.savez(out, **exported_dict)
+    # numpy appends the ending if it is missing
+    if not str(out).endswith(".npz"):
+        out = f"{out}.npz"
+    write_manifest(out, exported_dict, spec_hash, compress)
     print(f"Successfully wrote weights to {out}")
@@ -1,10 +1,19 @@
+from functools import cache
 from pathlib import Path
+from typing import Optional
+import hashlib
 import jinja2
 import os
 import json
 import jsonschema
 from .layers import Model
 
+"""Contains the digests of the specification files that passed validation."""
+_VALIDATED_SPECIFICATIONS: set[str] = set()
+
+"""Contains the models parsed from the specification files, by digest of the file."""
+_PARSED_MODELS: dict[str, tuple[Model, ...]] = {}
+
 
 def get_template(name: str):
     """
@@ -35,42 +44,139 @@ def make_py(models: list[Model], debug: bool = False):
     write_output(model_output_file, content)
 
 
-def make_rs(models: list[Model], debug: bool = False):
-    """Renders the given models into python code."""
-    template = get_template("models_template.rs.jinja2")
+def make_py_inference(models: list[Model], debug: bool = False):
+    """Renders the given models into python code that is optimized for inference
+    and loads the exported weights."""
+    template = get_template("models_inference_template.py.jinja2")
 
     content = template.render(models=models, file=__file__, debug=debug)
 
+    # writing out the models_inference.py file
+    model_output_file = os.path.join("models", "models_inference.py")
+    write_output(model_output_file, content)
+
+
+def make_rs(models: list[Model], spec_hash: str, debug: bool = False):
+    """Renders the given models into Rust code. The hash of the specification
+    is rendered in, so that the models can check that the weights fit them."""
+    template = get_template("models_template.rs.jinja2")
+
+    content = template.render(models=models, spec_hash=spec_hash, file=__file__, debug=debug)
+
     # writing out the models.rs file
     model_output_file = os.path.join("models", "models.rs")
     write_output(model_output_file, content)
 
 
+def make_bindings(models: list[Model], name: str, debug: bool = False):
+    """Renders PyO3 bindings for the given Rust models into a Python extension
+    module with the given name."""
+    template = get_template("bindings_template.rs.jinja2")
+
+    content = template.render(models=models, name=name, file=__file__, debug=debug)
+
+    # writing out the bindings.rs file
+    bindings_output_file = os.path.join("models", "bindings.rs")
+    write_output(bindings_output_file, content)
+
+
+@cache
+def get_validator() -> jsonschema.protocols.Validator:
+    """
+    Returns the validator for the model schema. The schema is loaded and checked
+    only once, and the validator is reused for every specification.
+    """
+    with open(Path(__file__).parent / "schema/model-schema.schema") as schema_file:
+        schema = json.load(schema_file)
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def _read_specification(spec: str) -> tuple[str, bytes]:
+    """Reads the specification file and returns its digest and its content."""
+    with open(spec, "rb") as specification_file:
+        content = specification_file.read()
+    return hashlib.sha256(content).hexdigest(), content
+
+
+def specification_hash(spec: str) -> str:
+    """Returns the hash of the specification file, which is recorded in the
+    manifest of the exported weights and in the generated Rust models."""
+    return _read_specification(spec)[0]
+
+
+def _validate_specification(digest: str, specifications: list[dict]):
+    """Validates the specifications according to the jsonschema, unless
+    a file with the same digest passed validation before."""
+    if digest in _VALIDATED_SPECIFICATIONS:
+        return
+    get_validator().validate(specifications)
+    _VALIDATED_SPECIFICATIONS.add(digest)
+    print("Model specification passed validation.")
+
+
+def load_specification(spec: str, skip_validation: bool = False) -> tuple[list[dict], str]:
+    """
+    Loads the specification file and returns the module specifications in it,
+    together with the hash of the file (see specification_hash).
+    If skip_validation is set to true, the specification is not validated
+    according to the jsonschema.
+    """
+    digest, content = _read_specification(spec)
+    specifications = json.loads(content)
+    if not skip_validation:
+        _validate_specification(digest, specifications)
+    return specifications, digest
+
+
+def models_from_specifications(specifications: list[dict], digest: str) -> list[Model]:
+    """
+    Returns the models described by the specifications that were loaded from the
+    file with the given digest (see load_specification), without reading the file again.
+    The models are cached by the digest and shared, so they must not be changed.
+    """
+    if digest not in _PARSED_MODELS:
+        _PARSED_MODELS[digest] = tuple(map(Model, specifications))
+    return list(_PARSED_MODELS[digest])
+
+
 def models_from_spec(spec: str, skip_validation: bool = False) -> list[Model]:
     """
     Takes in the specification and returns the described models that can
     be rendered afterwards. If skip_validation is set to true, the models are
     not validated according to the jsonschema.
+
+    The models are cached by the content of the specification file, so loading
+    the same specification again does not parse it again. The returned models are
+    shared between the calls and must not be changed.
     """
-    specification_file = open(spec, "r")
-    specifications = json.load(specification_file)
+    digest, content = _read_specification(spec)
+    if digest in _PARSED_MODELS and (skip_validation or digest in _VALIDATED_SPECIFICATIONS):
+        return list(_PARSED_MODELS[digest])
+    specifications = json.loads(content)
     if not skip_validation:
-        with open(Path(__file__).parent / "schema/model-schema.schema") as schema_file:
-            jsonschema.validate(specifications, json.load(schema_file))
-            print("Model specification passed validation.")
-    return list(map(Model, specifications))
+        _validate_specification(digest, specifications)
+    return models_from_specifications(specifications, digest)
 
 
 def generate_models(
     spec: str,
     skip_validation: bool = False,
     debug: bool = False,
+    python_bindings: Optional[str] = None,
 ):
     """
     Loads models from the given specification and turns them into
     useable python and Rust code that is written to the models folder.
+    If python_bindings is given, additionally writes PyO3 bindings for the
+    Rust models, which are compiled into the extension module of this name.
     """
     os.makedirs("models", exist_ok=True)
-    models = models_from_spec(spec, skip_validation=skip_validation)
+    specifications, spec_hash = load_specification(spec, skip_validation=skip_validation)
+    models = models_from_specifications(specifications, spec_hash)
     make_py(models, debug)
-    make_rs(models, debug)
+    make_py_inference(models, debug)
+    make_rs(models, spec_hash, debug)
+    if python_bindings is not None:
+        make_bindings(models, python_bindings, debug)
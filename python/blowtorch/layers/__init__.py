@@ -1,2 +1,3 @@
 from ._interfaces import Weight, Layer
+from ._graph import GraphValue
 from ._parsing import parse_layer, Model
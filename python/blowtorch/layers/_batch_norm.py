@@ -0,0 +1,70 @@
+from ._interfaces import Weight, Layer
+
+
+class BatchNormBase(Layer):
+    """
+    Base class for batch normalization. Batch normalization is only computed
+    during training: on export, its statistics and affine parameters are folded
+    into the weights of the layer before it, so it is never rendered in Rust.
+    """
+
+    def __init__(self, spec: dict) -> None:
+        super().__init__(spec)
+        self.num_features = spec["num_features"]
+        self.eps = spec.get("eps", 1e-5)
+
+    @property
+    def args_py(self) -> dict[str, str]:
+        return {
+            "num_features": str(self.num_features),
+            "eps": str(self.eps),
+        }
+
+    @property
+    def type_rust(self) -> str:
+        raise ValueError(f"{self} is folded into the layer before it and not rendered in Rust.")
+
+    @property
+    def weights(self) -> list[Weight]:
+        # the Pytorch weights are folded into the layer before, nothing is exported
+        return []
+
+    @property
+    def args_rust(self) -> list[str]:
+        return []
+
+    @property
+    def folds_into_input(self) -> bool:
+        return True
+
+
+class BatchNorm2d(BatchNormBase):
+    """Batch normalization of images, folded into the convolution before it on export."""
+
+    @property
+    def type_py(self) -> str:
+        return "BatchNorm2d"
+
+    @property
+    def input_dim(self) -> int:
+        return 3
+
+    @property
+    def output_dim(self) -> int:
+        return 3
+
+
+class BatchNorm1d(BatchNormBase):
+    """Batch normalization of features, folded into the linear layer before it on export."""
+
+    @property
+    def type_py(self) -> str:
+        return "BatchNorm1d"
+
+    @property
+    def input_dim(self) -> int:
+        return 1
+
+    @property
+    def output_dim(self) -> int:
+        return 1
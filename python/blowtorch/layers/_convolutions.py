@@ -1,9 +1,10 @@
-import ast
+import re
+from functools import cached_property
 from typing import Optional
-from ._interfaces import Layer, Weight
+from ._interfaces import FoldTargetBase, Layer, Weight
 
 
-class Conv2dBase(Layer):
+class Conv2dBase(FoldTargetBase):
     """
     Base class for 2d convolutions, as there is not much change between
     Conv2d and Conv2dTranspose.
@@ -13,10 +14,9 @@ class Conv2dBase(Layer):
         super().__init__(spec)
         self.in_channels = spec["in_channels"]
         self.out_channels = spec["out_channels"]
-        self.kernel_size = ast.literal_eval(spec["kernel_size"])
+        self.kernel_size = parse_kernel_size(spec["kernel_size"], self)
         self.stride = spec.get("stride", 1)
         self.padding = spec.get("padding", "valid")
-        self.bias = spec["bias"]
 
     @property
     def args_py(self) -> dict[str, str]:
@@ -40,8 +40,10 @@ class Conv2dBase(Layer):
             "bias": str(self.bias),
         }
 
-    @property
+    @cached_property
     def weights(self) -> list[Optional[Weight]]:
+        # convolutions-rs consumes the kernels in Pytorch layout (and does the
+        # im2col packing itself), so they are exported unchanged.
         kernel = Weight(
             "weight",
             (
@@ -51,10 +53,7 @@ class Conv2dBase(Layer):
                 self.kernel_size[1],
             ),
         )
-        if self.bias is False:
-            bias = None
-        else:
-            bias = Weight("bias", (self.out_channels,), optional=True)
+        bias = Weight("bias", (self.out_channels,), optional=True) if self.has_bias else None
         return [kernel, bias]
 
     @property
@@ -74,6 +73,10 @@ class Conv2d(Conv2dBase):
     """
     Represents a 2d convolutional layer that can be rendered in Python and Rust.
     """
+    @property
+    def out_channel_axis(self) -> int:
+        return 0
+
     @property
     def type_py(self) -> str:
         return "Conv2d"
@@ -86,6 +89,10 @@ class Conv2d(Conv2dBase):
 class Conv2dTranspose(Conv2dBase):
     """Represents a 2d transposed convolutional layer that can be rendered in Python and Rust."""
 
+    @property
+    def out_channel_axis(self) -> int:
+        return 1
+
     @property
     def type_py(self) -> str:
         return "ConvTranspose2d"
@@ -95,6 +102,16 @@ class Conv2dTranspose(Conv2dBase):
         return "TransposedConvolutionLayer"
 
 
+def parse_kernel_size(kernel_size: str, layer: Layer) -> tuple[int, int]:
+    """Returns the kernel size from a string of the format "(height,width)"."""
+    match = re.fullmatch(r"\(\s*(\d+)\s*,\s*(\d+)\s*\)", str(kernel_size))
+    if match is None:
+        raise ValueError(
+            f"{layer} has kernel_size {kernel_size!r}, expected the format \"(height,width)\"."
+        )
+    return int(match[1]), int(match[2])
+
+
 def parse_padding_from_string(padding: str) -> str:
     """Returns Rust padding from a padding string in {same, valid}."""
     assert padding is not None
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import heapq
+from collections import defaultdict
+from typing import Optional
+from ._interfaces import Layer
+
+"""Name under which layers refer to the input of the model."""
+MODEL_INPUT = "input"
+
+
+class GraphValue:
+    """
+    A value flowing along an edge of the model graph, as seen by the layer
+    that consumes it. Provides the expressions under which the value is
+    available in the generated code.
+
+    Attributes:
+        name: Name of the layer that produces the value, or "input" for the model input.
+        movable: Whether the consumer is the last user of the value, so the
+            generated Rust code may take it by value and reuse its buffer.
+    """
+
+    def __init__(self, name: str, movable: bool = False) -> None:
+        self.name = name
+        self.movable = movable
+
+    @property
+    def py(self) -> str:
+        """Python variable holding the value."""
+        return "x" if self.name == MODEL_INPUT else f"x_{self.name}"
+
+    @property
+    def var_rust(self) -> str:
+        """Rust variable holding the value (the model input is a reference)."""
+        return "input" if self.name == MODEL_INPUT else f"x_{self.name}"
+
+    @property
+    def ref_rust(self) -> str:
+        """Rust expression borrowing the value."""
+        return "input" if self.name == MODEL_INPUT else f"&x_{self.name}"
+
+    @property
+    def owned_rust(self) -> str:
+        """Rust expression that hands the value over by value if it is movable,
+        and borrows it otherwise."""
+        return self.var_rust if self.movable else self.ref_rust
+
+
+class GraphNode:
+    """
+    A layer of the model graph, together with its inputs in the order they are
+    passed to the layer.
+
+    Attributes:
+        layer: The layer that is computed in this node.
+        inputs: The values the layer consumes.
+        frees: Names of the values that are not used after this node and can be
+            dropped right away (values moved into the layer are not listed).
+    """
+
+    def __init__(self, layer: Layer, inputs: list[GraphValue], frees: list[str]) -> None:
+        self.layer = layer
+        self.inputs = inputs
+        self.frees = frees
+
+    @property
+    def name(self) -> str:
+        """Name of the node, which is the name of its layer."""
+        return self.layer.name
+
+
+def schedule(
+    layers: list[Layer], output: Optional[str] = None, fold: bool = False
+) -> list[GraphNode]:
+    """
+    Arranges the layers into an order in which every layer is computed after all
+    of its inputs. Layers without explicit inputs take the output of the previous
+    layer in the specification (the first one takes the model input).
+
+    The order of the specification is kept wherever the dependencies allow it.
+    Additionally records for every edge whether the consumer is the last user of the
+    value, so that the generated code can reuse or free its buffer.
+
+    If fold is set to true, layers that are folded into their input on export are
+    left out, and their consumers take the input of the folded layer instead.
+
+    Raises an error if the layers do not form a valid graph ending in output
+    (defaults to the last layer).
+    """
+    if len(layers) == 0:
+        raise ValueError("Empty model from specification.")
+    layers_by_name = {}
+    for l in layers:
+        if l.name == MODEL_INPUT:
+            raise ValueError(f"Layer name {MODEL_INPUT} is reserved for the model input.")
+        if l.name in layers_by_name:
+            raise ValueError(f"Layer name {l.name} is not unique.")
+        layers_by_name[l.name] = l
+    if output is None:
+        output = layers[-1].name
+    if output not in layers_by_name:
+        raise ValueError(f"Unknown output layer {output}.")
+
+    edges = {}
+    previous = MODEL_INPUT
+    for l in layers:
+        sources = l.inputs if l.inputs is not None else [previous]
+        for source in sources:
+            if source != MODEL_INPUT and source not in layers_by_name:
+                raise ValueError(f"Unknown input {source} of {l}.")
+        if l.multi_input and len(sources) < 2:
+            raise ValueError(f"{l} needs at least two inputs, found {sources}.")
+        if not l.multi_input and len(sources) != 1:
+            raise ValueError(f"{l} needs exactly one input, found {sources}.")
+        edges[l.name] = sources
+        previous = l.name
+
+    if fold:
+        folded = {l.name: edges[l.name][0] for l in layers if l.folds_into_input}
+
+        def resolve(name: str) -> str:
+            while name in folded:
+                name = folded[name]
+            return name
+
+        layers = [l for l in layers if l.name not in folded]
+        for name in folded:
+            del layers_by_name[name]
+            del edges[name]
+        edges = {name: [resolve(s) for s in sources] for name, sources in edges.items()}
+        output = resolve(output)
+        if output == MODEL_INPUT:
+            raise ValueError("Model output must not be a folded layer on the model input.")
+
+    # Kahn's algorithm, always picking the ready layer that comes first in the specification
+    position = {l.name: i for i, l in enumerate(layers)}
+    consumers = defaultdict(list)
+    missing_inputs = {}
+    for name, sources in edges.items():
+        dependencies = set(sources) - {MODEL_INPUT}
+        missing_inputs[name] = len(dependencies)
+        for source in dependencies:
+            consumers[source].append(name)
+    ready = [position[name] for name, missing in missing_inputs.items() if missing == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        name = layers[heapq.heappop(ready)].name
+        order.append(name)
+        for consumer in consumers[name]:
+            missing_inputs[consumer] -= 1
+            if missing_inputs[consumer] == 0:
+                heapq.heappush(ready, position[consumer])
+    if len(order) != len(layers):
+        cycle = [name for name in layers_by_name if name not in order]
+        raise ValueError(f"Model graph contains a cycle between the layers {cycle}.")
+    for name in order:
+        if name != output and len(consumers[name]) == 0:
+            raise ValueError(f"Output of {layers_by_name[name]} is never used.")
+
+    last_user = {}
+    for name in order:
+        for source in edges[name]:
+            last_user[source] = name
+
+    def is_movable(source: str, name: str) -> bool:
+        # the model input is only borrowed, and the output is still needed at the end
+        return (
+            source not in (MODEL_INPUT, output)
+            and last_user[source] == name
+            and edges[name].count(source) == 1
+        )
+
+    nodes = []
+    for name in order:
+        layer = layers_by_name[name]
+        inputs = [GraphValue(source, is_movable(source, name)) for source in edges[name]]
+        moved = inputs[0].name if layer.consumes_first_input and inputs[0].movable else None
+        frees = [
+            source
+            for source in dict.fromkeys(edges[name])
+            if source not in (MODEL_INPUT, output, moved) and last_user[source] == name
+        ]
+        nodes.append(GraphNode(layer, inputs, frees))
+    return nodes
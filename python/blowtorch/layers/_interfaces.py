@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from abc import ABC, abstractmethod
 
+if TYPE_CHECKING:
+    from ._graph import GraphValue
+
 
 class Weight:
     """
@@ -15,10 +18,19 @@ class Weight:
         name: Name of the weight.
         shape: Shape of the weight.
         optional: Whether the weight is optional.
+        layout: Memory layout the weight is packed into on export.
+        source: Name of the Pytorch weight that this weight is exported from.
     """
 
+    __slots__ = ("name", "shape", "optional", "layout", "source")
+
     def __init__(
-        self, name: str, shape: tuple[int, ...], optional: bool = False
+        self,
+        name: str,
+        shape: tuple[int, ...],
+        optional: bool = False,
+        layout: str = "torch",
+        source: Optional[str] = None,
     ) -> None:
         """Initializes a layer weight
 
@@ -26,14 +38,30 @@ class Weight:
             name: Name of the weight. This must be equal to the name of the struct
                 used in Rust to represent the weight.
             shape: Shape of the weight. This is used in the Rust code to load the weight from
-                the npz weights file.
+                the npz weights file, so it has to be the shape after packing.
             optional: Whether the weight is optional. If it is optional, the Rust code will
                 wrap its type in an optional type.
+            layout: Layout that the Rust layer consumes the weight in. The exporter
+                packs the Pytorch tensor into this layout, so that the Rust layer can
+                use the loaded weight as-is. "torch" keeps the Pytorch layout,
+                "transposed" stores the transpose of a 2d weight in row-major order.
+                "csr_data", "csr_indices" and "csr_indptr" store one of the arrays of the
+                compressed sparse row representation of a 2d weight.
+            source: Name of the Pytorch weight (in the layer) that this weight is exported
+                from, if it differs from the name. Several weights can share a source,
+                for example the arrays of a sparse representation.
 
         """
         self.name = name
         self.shape = str(shape)
         self.optional = optional
+        self.layout = layout
+        self.source = source if source is not None else name
+
+    @property
+    def is_index(self) -> bool:
+        """Whether the weight is exported as 64 bit integer indices instead of floats."""
+        return self.layout in ("csr_indices", "csr_indptr")
 
 
 class Layer(ABC):
@@ -48,15 +76,69 @@ class Layer(ABC):
     def __init__(self, spec: dict):
         """
         Base initialization for all layers.
-        The name is always read from the specification in the same way.
+        The name and the inputs are always read from the specification in the same way.
         """
         self._name = spec["name"]
+        self._inputs = spec.get("inputs")
 
     @property
     def name(self) -> str:
         """Returns the name of the layer."""
         return self._name
 
+    @property
+    def inputs(self) -> Optional[list[str]]:
+        """Names of the layers (or "input" for the model input) whose outputs are
+        fed into this layer. None if the layer simply takes the output of the
+        previous layer in the specification."""
+        return self._inputs
+
+    @property
+    def is_module(self) -> bool:
+        """Whether the layer is rendered as a Python module / Rust struct. Layers that
+        are plain operations on their inputs (such as adding them) return False and
+        are only rendered through forward_py and forward_rust."""
+        return True
+
+    @property
+    def multi_input(self) -> bool:
+        """Whether the layer takes more than one input."""
+        return False
+
+    @property
+    def consumes_first_input(self) -> bool:
+        """Whether the Rust expression of the layer takes its first input by value
+        (if the input is not used afterwards), reusing its buffer for the output."""
+        return False
+
+    @property
+    def folds_into_input(self) -> bool:
+        """Whether the layer is folded into the weights of the layer before it on export
+        (such as batch normalization). Folded layers are only computed in the Python
+        training model, and are left out in Rust and in the Python inference model."""
+        return False
+
+    def fold(self, layer: Layer) -> None:
+        """Folds the given layer (which follows this layer) into this layer.
+        Layers that support folding record it here and adapt their weights."""
+        raise ValueError(f"{layer} cannot be folded into {self}.")
+
+    @property
+    def args_py_inference(self) -> dict[str, str]:
+        """Arguments that are passed to the constructor of this layer in the Python
+        inference model, where folded layers are already merged in."""
+        return self.args_py
+
+    def forward_py(self, inputs: list[GraphValue]) -> str:
+        """Python expression that computes the output of the layer from the given
+        inputs in a graph model."""
+        return f'self.layers["{self.name}"]({inputs[0].py})'
+
+    def forward_rust(self, inputs: list[GraphValue]) -> str:
+        """Rust expression that computes the output of the layer from the given
+        inputs in a graph model."""
+        return f"self.{self.name}.forward_pass({inputs[0].ref_rust})"
+
     def __str__(self) -> str:
         return f"Layer[{self.name}]"
 
@@ -86,9 +168,18 @@ class Layer(ABC):
     @abstractmethod
     def weights(self) -> list[Optional[Weight]]:
         """List of weights that are used by this layer. If a layer weight is absent
-        (for example if the layer does not have a bias), the corresponding element is set to None."""
+        (for example if the layer does not have a bias), the corresponding element is set to None.
+        Layers with many weights can implement this as a functools.cached_property,
+        as it is read several times while rendering and exporting."""
         pass
 
+    @property
+    def constructor_rust(self) -> str:
+        """Name of the associated function that constructs the Rust layer from its
+        weights and arguments. Override this if the layer loads its weights in a layout
+        that needs a different constructor than `new`."""
+        return "new"
+
     @property
     @abstractmethod
     def args_rust(self) -> list[str]:
@@ -113,3 +204,44 @@ class Layer(ABC):
         that the output dimension is the same as the input dimension.
         """
         pass
+
+
+class FoldTargetBase(Layer):
+    """
+    Base class for layers that a batch norm can be folded into (convolutions and linear
+    layers). The batch norm scales the output channels and shifts them, so the weight
+    is scaled along out_channel_axis on export, and the layer always gets a bias.
+    """
+
+    """Name of the attribute that holds the number of output channels."""
+    out_count_attribute = "out_channels"
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.bias = spec["bias"]
+        self.folded_norm: Optional[Layer] = None
+
+    @property
+    @abstractmethod
+    def out_channel_axis(self) -> int:
+        """Axis of the output channels in the Pytorch weight."""
+        pass
+
+    @property
+    def has_bias(self) -> bool:
+        """Whether the layer has a bias in Rust and in the Python inference model."""
+        return self.bias is not False or self.folded_norm is not None
+
+    def fold(self, layer: Layer) -> None:
+        out_count = getattr(self, self.out_count_attribute)
+        if not layer.folds_into_input or layer.num_features != out_count:
+            super().fold(layer)
+        self.folded_norm = layer
+        # the weights depend on the folded layer
+        self.__dict__.pop("weights", None)
+
+    @property
+    def args_py_inference(self) -> dict[str, str]:
+        args = self.args_py
+        args["bias"] = str(self.has_bias)
+        return args
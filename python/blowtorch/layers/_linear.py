@@ -1,18 +1,23 @@
-import ast
+from functools import cached_property
 from typing import Optional
-from ._interfaces import Layer, Weight
+from ._interfaces import FoldTargetBase, Weight
 
 
-class LinearLayer(Layer):
+class LinearLayer(FoldTargetBase):
     """Base class for the linear layer. Represents the linear layer that can be
     rendered with both python and rust.
     """
 
+    out_count_attribute = "out_features"
+
     def __init__(self, spec):
         super().__init__(spec)
         self.in_features = spec["in_features"]
         self.out_features = spec["out_features"]
-        self.bias = spec["bias"]
+        self.sparse = spec.get("sparse", False)
+        self.nnz = spec.get("nnz")
+        if self.sparse and self.nnz is None:
+            raise ValueError(f"{self} is sparse, but the number of non-zero weights (nnz) is missing.")
         self._name = spec["name"]
 
     @property
@@ -26,16 +31,25 @@ class LinearLayer(Layer):
 
     @property
     def type_rust(self) -> str:
-        return "LinearLayer"
+        return "SparseLinearLayer" if self.sparse else "LinearLayer"
 
-    @property
+    @cached_property
     def weights(self) -> list[Optional[Weight]]:
-        kernel = Weight("weight", (self.out_features, self.in_features))
-        if self.bias is False:
-            bias = None
+        if self.sparse:
+            # compressed sparse row representation of the Pytorch weight
+            kernel = [
+                Weight("weight_data", (self.nnz,), layout="csr_data", source="weight"),
+                Weight("weight_indices", (self.nnz,), layout="csr_indices", source="weight"),
+                Weight("weight_indptr", (self.out_features + 1,), layout="csr_indptr", source="weight"),
+            ]
         else:
-            bias = Weight("bias", (self.out_features,), optional=True)
-        return [kernel, bias]
+            # The Rust layer multiplies the input from the left, so it consumes the
+            # transposed Pytorch weight (in_features x out_features).
+            kernel = [
+                Weight("weight", (self.in_features, self.out_features), layout="transposed")
+            ]
+        bias = Weight("bias", (self.out_features,), optional=True) if self.has_bias else None
+        return kernel + [bias]
 
     @property
     def args_py(self) -> dict[str, str]:
@@ -45,9 +59,17 @@ class LinearLayer(Layer):
             "bias": str(self.bias),
         }
 
+    @property
+    def out_channel_axis(self) -> int:
+        return 0
+
+    @property
+    def constructor_rust(self) -> str:
+        return "new" if self.sparse else "new_packed"
+
     @property
     def args_rust(self) -> list[str]:
-        return []
+        return [str(self.in_features)] if self.sparse else []
 
     @property
     def input_dim(self) -> int:
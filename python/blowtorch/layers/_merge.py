@@ -0,0 +1,103 @@
+from ._graph import GraphValue
+from ._interfaces import Weight, Layer
+
+
+class MergeBase(Layer):
+    """
+    Base class for operations that combine or split the values of a model graph.
+    They have no weights and are not rendered as modules, but directly as
+    expressions on their inputs.
+    """
+
+    def __init__(self, spec: dict) -> None:
+        super().__init__(spec)
+
+    @property
+    def is_module(self) -> bool:
+        return False
+
+    @property
+    def type_py(self) -> str:
+        raise ValueError(f"{self} is not rendered as a Python module.")
+
+    @property
+    def args_py(self) -> dict[str, str]:
+        return {}
+
+    @property
+    def type_rust(self) -> str:
+        raise ValueError(f"{self} is not rendered as a Rust layer.")
+
+    @property
+    def weights(self) -> list[Weight]:
+        return []
+
+    @property
+    def args_rust(self) -> list[str]:
+        return []
+
+    @property
+    def input_dim(self) -> int:
+        return -1
+
+    @property
+    def output_dim(self) -> int:
+        return -1
+
+
+class Add(MergeBase):
+    """Elementwise sum of all inputs, e.g. for residual connections."""
+
+    @property
+    def multi_input(self) -> bool:
+        return True
+
+    @property
+    def consumes_first_input(self) -> bool:
+        return True
+
+    def forward_py(self, inputs: list[GraphValue]) -> str:
+        return " + ".join(i.py for i in inputs)
+
+    def forward_rust(self, inputs: list[GraphValue]) -> str:
+        # Adding to an owned array reuses its buffer for the result.
+        return " + ".join([inputs[0].owned_rust] + [i.ref_rust for i in inputs[1:]])
+
+
+class Concat(MergeBase):
+    """Concatenates all inputs along the channel dimension."""
+
+    @property
+    def multi_input(self) -> bool:
+        return True
+
+    def forward_py(self, inputs: list[GraphValue]) -> str:
+        # dimension 0 is the batch in Python
+        return f"torch.cat([{', '.join(i.py for i in inputs)}], dim=1)"
+
+    def forward_rust(self, inputs: list[GraphValue]) -> str:
+        views = ", ".join(f"{i.var_rust}.view()" for i in inputs)
+        return f"concatenate(Axis(0), &[{views}]).unwrap()"
+
+
+class Split(MergeBase):
+    """
+    Selects the channels [start, end) of its input. A split into several branches
+    is expressed by one Split layer per branch.
+    """
+
+    def __init__(self, spec: dict) -> None:
+        super().__init__(spec)
+        self.start = spec["start"]
+        self.end = spec["end"]
+        if not 0 <= self.start < self.end:
+            raise ValueError(f"{self} has an empty channel range [{self.start}, {self.end}).")
+
+    def forward_py(self, inputs: list[GraphValue]) -> str:
+        return f"{inputs[0].py}[:, {self.start}:{self.end}]"
+
+    def forward_rust(self, inputs: list[GraphValue]) -> str:
+        return (
+            f"{inputs[0].var_rust}.slice_axis(Axis(0), "
+            f"Slice::from({self.start}..{self.end})).to_owned()"
+        )
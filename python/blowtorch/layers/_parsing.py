@@ -3,6 +3,9 @@ from ._convolutions import Conv2d, Conv2dTranspose
 from ._relu import Relu
 from ._linear import LinearLayer
 from ._flatten import Flatten
+from ._batch_norm import BatchNorm1d, BatchNorm2d
+from ._merge import Add, Concat, Split
+from ._graph import GraphNode, MODEL_INPUT, schedule
 from ._interfaces import Layer
 
 """Contains the mapping of layer names (as in the specification) to 
@@ -13,6 +16,11 @@ LAYER_DISPATCH = {
     "Linear": LinearLayer,
     "Flatten": Flatten,
     "ReLU": Relu,
+    "Add": Add,
+    "Concat": Concat,
+    "Split": Split,
+    "BatchNorm1d": BatchNorm1d,
+    "BatchNorm2d": BatchNorm2d,
 }
 
 """
@@ -37,13 +45,21 @@ def parse_layer(layer_spec: dict) -> Layer:
 class Model:
     """
     Model that can be parsed by the models_template.rs Jinja file.
-    Models that we represent are always equivalent to simple Sequential Modules.
+    Models are either simple Sequential Modules, or graphs of layers where layers
+    name their inputs explicitly (e.g. for residual connections).
 
     Attributes:
         input_dim: The dimension of the input to the model (e.g. 3 for RGB images).
         output_dim: The dimension of the output of the model (e.g. 1 for a classification task)
         module_name: The name of the module that will be generated (this directly the name of the Rust/Python classes)
         layers: List of the layers that make up this model.
+        output: Name of the layer whose output is the output of the model.
+        nodes: The layers in the order in which they are computed, together with their inputs.
+        is_graph: Whether the model is rendered as a graph instead of a Sequential Module.
+        inference_layers: The layers that are computed at inference (in Rust), without
+            layers that are folded into the layer before them.
+        inference_nodes: The nodes that are computed at inference, like nodes.
+        inference_output: Name of the layer whose output is the output of the model at inference.
     """
 
     def __init__(self, specification):
@@ -52,10 +68,47 @@ class Model:
         """
         self.module_name = specification["module_name"]
         self.layers: List[Layer] = list(map(parse_layer, specification["layers"]))
-        self.input_dim, self.output_dim = Model._calculate_tensor_shapes(self.layers)
+        self.nodes: List[GraphNode] = schedule(self.layers, specification.get("output"))
+        self.output = self.nodes[-1].name
+        self.is_graph = "output" in specification or any(
+            l.inputs is not None or not l.is_module for l in self.layers
+        )
+        self.input_dim, self.output_dim = Model._calculate_tensor_shapes(self.nodes)
+        Model._fold_layers(self.nodes)
+        self.inference_layers: List[Layer] = [
+            l for l in self.layers if not l.folds_into_input
+        ]
+        self.inference_nodes: List[GraphNode] = schedule(
+            self.layers, specification.get("output"), fold=True
+        )
+        self.inference_output = self.inference_nodes[-1].name
 
     @staticmethod
-    def _calculate_tensor_shapes(layers: list[Layer]) -> tuple[int, int]:
+    def _fold_layers(nodes: list[GraphNode]):
+        """
+        Folds every layer that folds into its input into the layer before it.
+        The layer before must support folding, and must not have other consumers,
+        as they would see the folded output.
+        """
+        layers = {node.name: node.layer for node in nodes}
+        consumers = {}
+        for node in nodes:
+            for value in node.inputs:
+                consumers.setdefault(value.name, set()).add(node.name)
+        for node in nodes:
+            if not node.layer.folds_into_input:
+                continue
+            source = node.inputs[0].name
+            if source == MODEL_INPUT:
+                raise ValueError(f"{node.layer} has no layer before it to be folded into.")
+            if len(consumers[source]) > 1:
+                raise ValueError(
+                    f"{node.layer} cannot be folded into {layers[source]}, which has other consumers."
+                )
+            layers[source].fold(node.layer)
+
+    @staticmethod
+    def _calculate_tensor_shapes(nodes: list[GraphNode]) -> tuple[int, int]:
         """
         Calculates the shapes a sample input would have when going through the model.
 
@@ -65,24 +118,42 @@ class Model:
 
         Returns the total input/output shapes of the model.
         """
-        if len(layers) == 0:
-            raise ValueError("Empty model from specification.")
-        x_dim = layers[0].input_dim
-        if x_dim == -1:
+        # the input dimension is given by the layers with a fixed input size that read
+        # the model input, flexible layers (e.g. a residual Add) take it over
+        input_dim = None
+        for node in nodes:
+            l = node.layer
+            if l.input_dim == -1 or all(v.name != MODEL_INPUT for v in node.inputs):
+                continue
+            if input_dim is not None and input_dim != l.input_dim:
+                raise ValueError(
+                    f"Model had input sizes missmatch at {l}, expected dim {l.input_dim}, found {input_dim}."
+                )
+            input_dim = l.input_dim
+        if input_dim is None:
             raise ValueError(
-                f"Model shall not start with a flexible input-size layer, found: {layers[0]}"
+                "Model shall not only have flexible input-size layers on its input, found: "
+                + ", ".join(str(n.layer) for n in nodes if any(v.name == MODEL_INPUT for v in n.inputs))
             )
 
-        for l in layers:
-            if l.input_dim == -1 or x_dim == l.input_dim:
-                if l.output_dim == -1:
-                    pass  # x_dim simply stays the way it is
-                else:
-                    x_dim = l.output_dim
+        dims = {}
+        for node in nodes:
+            l = node.layer
+            input_dims = [
+                input_dim if value.name == MODEL_INPUT else dims[value.name]
+                for value in node.inputs
+            ]
 
+            x_dim = input_dims[0]
+            if any(d != x_dim for d in input_dims):
+                raise ValueError(
+                    f"Model had input sizes missmatch at {l}, found dims {input_dims}."
+                )
             if l.input_dim != -1 and x_dim != l.input_dim:
                 raise ValueError(
                     f"Model had input sizes missmatch at {l}, expected dim {l.input_dim}, found {x_dim}."
                 )
-            assert x_dim != -1  # dummy check
-        return layers[0].input_dim, x_dim
+            # flexible layers keep the dimension of their input
+            dims[l.name] = x_dim if l.output_dim == -1 else l.output_dim
+        # the scheduler ensures that the output is computed last
+        return input_dim, dims[nodes[-1].name]
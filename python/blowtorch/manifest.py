@@ -0,0 +1,50 @@
+"""
+Writes the manifest of exported weights. The manifest is stored as manifest.json
+in the npz archive, next to the weights, and records for every weight its key,
+dtype, shape, the offset of its data in the .npy file and the xxhash of its data,
+together with the hash of the specification the weights were exported for.
+The Rust loader uses it to check that weights and models fit together before
+loading them (see rust/src/manifest.rs).
+"""
+import json
+import zipfile
+import numpy as np
+import xxhash
+
+"""Name of the manifest in the npz archive."""
+MANIFEST_NAME = "manifest.json"
+
+
+def _data_offset(archive: zipfile.ZipFile, key: str) -> int:
+    """Returns the offset of the array data in the .npy file of the given key,
+    which is the size of its header. Only the header is read."""
+    with archive.open(f"{key}.npy") as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        if version == (1, 0):
+            np.lib.format.read_array_header_1_0(npy_file)
+        else:
+            np.lib.format.read_array_header_2_0(npy_file)
+        return npy_file.tell()
+
+
+def write_manifest(path: str, arrays: dict[str, np.ndarray], spec_hash: str, compress: bool = False):
+    """
+    Adds the manifest of the given arrays, which have been written to the npz file
+    at path, to the npz file. The arrays must be C-contiguous, as they are hashed as
+    they are stored in the .npy files.
+    """
+    with zipfile.ZipFile(path, "r") as archive:
+        weights = [
+            {
+                "key": key,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": _data_offset(archive, key),
+                "xxhash": xxhash.xxh3_64_hexdigest(array),
+            }
+            for key, array in arrays.items()
+        ]
+    manifest = {"spec_hash": spec_hash, "weights": weights}
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(path, "a", compression=compression) as archive:
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=4))
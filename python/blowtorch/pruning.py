@@ -0,0 +1,154 @@
+"""
+Prunes models on export. Output channels of convolutions and linear layers that are
+zero (or that the next layer does not use) are removed from the weights and the
+specification, and linear layers with mostly zero weights are marked to be exported
+in compressed sparse row format.
+"""
+import copy
+from typing import Optional
+import numpy as np
+
+from .layers import Model
+
+"""Contains the axes of the output and input channels in the Pytorch weights
+of the layers that can be pruned."""
+CHANNEL_AXES = {
+    "Conv2d": (0, 1),
+    "Conv2dTranspose": (1, 0),
+    "Linear": (0, 1),
+}
+
+"""Layers that map zero inputs to zero outputs and keep the channels apart,
+so pruning can look through them."""
+ZERO_PRESERVING = {"ReLU", "Flatten"}
+
+"""Layers that are folded into the layer before them on export. Pruning expects
+the weights to be folded already, and removes the channels of these layers too."""
+FOLDED = {"BatchNorm1d", "BatchNorm2d"}
+
+
+def _count_keys(layer: dict) -> tuple[str, str]:
+    """Returns the specification keys of the output and input channel counts."""
+    if layer["type"] == "Linear":
+        return "out_features", "in_features"
+    return "out_channels", "in_channels"
+
+
+def _prune_channels(module: dict, state_dict: dict[str, np.ndarray]):
+    """
+    Removes the dead output channels of every layer in the sequential module whose
+    output is consumed by another prunable layer, together with the matching
+    input channels of the consumer. A channel is dead if the producer always outputs
+    zero there (all weights and the bias are zero), or if the consumer does not use it
+    (all its weights for the channel are zero).
+    """
+    layers = module["layers"]
+    prunable = [i for i, l in enumerate(layers) if l["type"] in CHANNEL_AXES]
+    for producer_index, consumer_index in zip(prunable, prunable[1:]):
+        between = layers[producer_index + 1 : consumer_index]
+        if any(l["type"] not in ZERO_PRESERVING | FOLDED for l in between):
+            continue
+        producer, consumer = layers[producer_index], layers[consumer_index]
+        out_axis, _ = CHANNEL_AXES[producer["type"]]
+        _, in_axis = CHANNEL_AXES[consumer["type"]]
+        producer_key = f"layers.{producer['name']}"
+        consumer_key = f"layers.{consumer['name']}"
+
+        producer_weight = state_dict[f"{producer_key}.weight"]
+        channels = producer_weight.shape[out_axis]
+        produced = np.moveaxis(producer_weight, out_axis, 0).reshape(channels, -1).any(axis=1)
+        bias = state_dict.get(f"{producer_key}.bias")
+        if bias is not None:
+            produced |= bias != 0
+
+        consumer_weight = state_dict[f"{consumer_key}.weight"]
+        if consumer_weight.shape[in_axis] % channels != 0:
+            continue
+        # after a flatten, every channel is spread over a block of consecutive inputs
+        block = consumer_weight.shape[in_axis] // channels
+        consumed = np.moveaxis(consumer_weight, in_axis, 0).reshape(channels, -1).any(axis=1)
+
+        keep = produced & consumed
+        if keep.all():
+            continue
+        if not keep.any():
+            # keep one channel, as the layers cannot be empty
+            keep[0] = True
+        kept = np.flatnonzero(keep)
+        kept_inputs = (kept[:, None] * block + np.arange(block)).reshape(-1)
+
+        state_dict[f"{producer_key}.weight"] = np.take(producer_weight, kept, axis=out_axis)
+        if bias is not None:
+            state_dict[f"{producer_key}.bias"] = bias[kept]
+        state_dict[f"{consumer_key}.weight"] = np.take(consumer_weight, kept_inputs, axis=in_axis)
+        producer[_count_keys(producer)[0]] = len(kept)
+        consumer[_count_keys(consumer)[1]] = len(kept_inputs)
+        for norm in between:
+            if norm["type"] not in FOLDED:
+                continue
+            norm["num_features"] = len(kept)
+            for key in ("weight", "bias", "running_mean", "running_var"):
+                norm_key = f"layers.{norm['name']}.{key}"
+                if norm_key in state_dict:
+                    state_dict[norm_key] = state_dict[norm_key][kept]
+        print(f"Pruned {producer['name']} from {channels} to {len(kept)} output channels.")
+
+
+def _mark_sparse(module: dict, state_dict: dict[str, np.ndarray], sparse_threshold: float):
+    """
+    Marks the linear layers of the module whose fraction of non-zero weights is at most
+    sparse_threshold as sparse, so their weights are exported in compressed sparse row format.
+    """
+    for layer in module["layers"]:
+        if layer["type"] != "Linear":
+            continue
+        weight = state_dict[f"layers.{layer['name']}.weight"]
+        nnz = int(np.count_nonzero(weight))
+        if nnz <= sparse_threshold * weight.size:
+            layer["sparse"] = True
+            layer["nnz"] = nnz
+            print(f"Exporting {layer['name']} as sparse layer ({nnz}/{weight.size} non-zero weights).")
+        elif layer.get("sparse", False):
+            layer["sparse"] = False
+            del layer["nnz"]
+
+
+def _update_nnz(module: dict, state_dict: dict[str, np.ndarray]):
+    """Updates the number of non-zero weights of the sparse linear layers in the module,
+    which changes if channels were pruned."""
+    for layer in module["layers"]:
+        if layer["type"] == "Linear" and layer.get("sparse", False):
+            layer["nnz"] = int(np.count_nonzero(state_dict[f"layers.{layer['name']}.weight"]))
+
+
+def prune_models(
+    specifications: list[dict],
+    state_dict: dict[str, np.ndarray],
+    structured: bool = True,
+    sparse_threshold: Optional[float] = None,
+) -> tuple[list[dict], dict[str, np.ndarray]]:
+    """
+    Prunes the modules of the specification with the given weights, in which
+    batch norms have to be folded already (see fold_batch_norms).
+
+    If structured is set to true, dead channels are removed from sequential modules
+    (graph modules are left as they are). If a sparse_threshold is given, linear layers
+    with at most this fraction of non-zero weights are marked as sparse.
+
+    Returns the pruned specifications and weights, the arguments are not changed.
+    """
+    specifications = copy.deepcopy(specifications)
+    state_dict = dict(state_dict)
+    for module in specifications:
+        if structured:
+            if Model(module).is_graph:
+                print(
+                    f"Not pruning channels of {module['module_name']}, only sequential modules are supported."
+                )
+            else:
+                _prune_channels(module, state_dict)
+        if sparse_threshold is not None:
+            _mark_sparse(module, state_dict, sparse_threshold)
+        else:
+            _update_nnz(module, state_dict)
+    return specifications, state_dict
@@ -0,0 +1,305 @@
+"""
+Harness for serving generated models. Requests are collected into micro-batches
+(up to a maximum size or until a deadline passes) and dispatched to a pool of
+worker threads, while latency and throughput are recorded.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+import numpy as np
+
+ModelFn = Callable[[np.ndarray], np.ndarray]
+
+
+def torch_model_fn(model) -> ModelFn:
+    """
+    Wraps a Pytorch model (e.g. from the generated models.py) into a function
+    that takes and returns batches as numpy arrays. Use this if the Rust model
+    is not available through Python bindings.
+    """
+    # Only imported here, as the harness does not need Pytorch for other models.
+    import torch
+
+    model.eval()
+
+    def run(batch: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            return model(torch.from_numpy(batch)).numpy()
+
+    return run
+
+
+def rust_model_fn(model) -> ModelFn:
+    """
+    Wraps a model from the generated Python bindings (see generate --python-bindings)
+    into a function that takes and returns batches as numpy arrays. The Rust models
+    run on single inputs and release the GIL, so several workers run in parallel.
+    """
+
+    def run(batch: np.ndarray) -> np.ndarray:
+        return np.stack([model.forward(x) for x in batch])
+
+    return run
+
+
+class ServingMetrics:
+    """
+    Latency and throughput metrics of a BatchingServer. Latencies and batch sizes
+    are kept for a window of the most recent requests and batches, so the metrics
+    of a long-running server take constant memory.
+
+    Attributes:
+        latencies: Latencies of the last window finished requests in seconds, measured
+            from submitting the request to receiving its result.
+        batch_sizes: Sizes of the last window batches that were dispatched.
+        requests: Number of all finished requests.
+    """
+
+    def __init__(self, window: int = 100_000) -> None:
+        """
+        Initializes empty metrics.
+
+        Args:
+            window: Number of the most recent latencies and batch sizes that are kept.
+        """
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.batch_sizes: deque[int] = deque(maxlen=window)
+        self.requests = 0
+        self._first_request: Optional[float] = None
+        self._last_result: Optional[float] = None
+
+    def record_request(self, submitted: float, finished: float) -> None:
+        """Records a finished request with its submission and finishing time."""
+        if self._first_request is None or submitted < self._first_request:
+            self._first_request = submitted
+        if self._last_result is None or finished > self._last_result:
+            self._last_result = finished
+        self.latencies.append(finished - submitted)
+        self.requests += 1
+
+    @property
+    def throughput(self) -> float:
+        """Finished requests per second."""
+        if self._first_request is None or self._last_result == self._first_request:
+            return 0.0
+        return self.requests / (self._last_result - self._first_request)
+
+    def latency_percentile(self, percentile: float) -> float:
+        """Returns the given percentile (0-100) of the request latencies in seconds."""
+        if len(self.latencies) == 0:
+            return 0.0
+        return float(np.percentile(self.latencies, percentile))
+
+    def summary(self) -> dict[str, float]:
+        """Returns the most important metrics, with latencies in milliseconds."""
+        return {
+            "requests": self.requests,
+            "throughput_per_s": self.throughput,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            "latency_p50_ms": 1e3 * self.latency_percentile(50),
+            "latency_p95_ms": 1e3 * self.latency_percentile(95),
+            "latency_p99_ms": 1e3 * self.latency_percentile(99),
+        }
+
+
+class BatchingServer:
+    """
+    Asynchronous front end around a model that answers single requests by
+    running the model on micro-batches.
+
+    A batch is dispatched as soon as it has max_batch_size requests, or when
+    max_delay seconds passed since its first request. While all workers are busy,
+    no batch is dispatched, so that requests accumulate into larger batches under load.
+
+    Use it as an async context manager:
+
+        async with BatchingServer(torch_model_fn(model)) as server:
+            y = await server.infer(x)
+    """
+
+    def __init__(
+        self,
+        model_fn: ModelFn,
+        max_batch_size: int = 32,
+        max_delay: float = 0.005,
+        workers: int = 1,
+    ) -> None:
+        """
+        Initializes the server.
+
+        Args:
+            model_fn: Function that runs the model on a batch, stacked along
+                the first axis, and returns the batched outputs.
+            max_batch_size: Maximum number of requests in a batch.
+            max_delay: Maximum time in seconds that the first request of a batch
+                waits for further requests.
+            workers: Number of threads that run batches in parallel.
+        """
+        if max_batch_size < 1 or workers < 1:
+            raise ValueError("max_batch_size and workers have to be at least 1.")
+        self.model_fn = model_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.workers = workers
+        self.metrics = ServingMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._running: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Starts collecting and dispatching requests."""
+        if self._collector is not None:
+            raise RuntimeError("Server is already running.")
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """Waits for the dispatched batches to finish and stops the server.
+        Requests that were not dispatched yet, or that are submitted while stopping,
+        fail with a RuntimeError."""
+        if self._collector is None or self._stopping:
+            return
+        self._stopping = True
+        self._collector.cancel()
+        try:
+            await self._collector
+        except asyncio.CancelledError:
+            pass
+        await asyncio.gather(*self._running)
+        # fails requests that reached the queue after the collector drained it
+        while not self._queue.empty():
+            _, result, _ = self._queue.get_nowait()
+            if not result.done():
+                result.set_exception(RuntimeError("Server was stopped."))
+        self._executor.shutdown()
+        self._collector = None
+        self._stopping = False
+
+    async def __aenter__(self) -> "BatchingServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def infer(self, x: np.ndarray) -> np.ndarray:
+        """Runs the model on a single (unbatched) input and returns its output."""
+        if self._collector is None:
+            raise RuntimeError("Server is not running, call start first.")
+        if self._stopping:
+            raise RuntimeError("Server is stopping.")
+        result = asyncio.get_running_loop().create_future()
+        await self._queue.put((x, result, time.perf_counter()))
+        return await result
+
+    async def _collect(self) -> None:
+        """Collects requests into batches and dispatches them."""
+        free_workers = asyncio.Semaphore(self.workers)
+        batch = []
+        try:
+            while True:
+                await free_workers.acquire()
+                batch = [await self._queue.get()]
+                # the first request may already have waited for a free worker
+                deadline = batch[0][2] + self.max_delay
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                task = asyncio.create_task(self._dispatch(batch, free_workers))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # requests that were not dispatched yet are never answered
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for _, result, _ in batch:
+                if not result.done():
+                    result.set_exception(RuntimeError("Server was stopped."))
+            raise
+
+    async def _dispatch(self, batch: list, free_workers: asyncio.Semaphore) -> None:
+        """Runs the model on the batch in a worker and hands out the results."""
+        try:
+            inputs = np.stack([x for x, _, _ in batch])
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.model_fn, inputs
+            )
+            if len(outputs) != len(batch):
+                raise ValueError(
+                    f"Model returned {len(outputs)} outputs for a batch of {len(batch)} requests."
+                )
+        except Exception as e:
+            for _, result, _ in batch:
+                if not result.done():
+                    result.set_exception(e)
+            return
+        finally:
+            free_workers.release()
+
+        finished = time.perf_counter()
+        self.metrics.batch_sizes.append(len(batch))
+        for output, (_, result, submitted) in zip(outputs, batch):
+            self.metrics.record_request(submitted, finished)
+            if not result.done():
+                result.set_result(output)
+
+
+async def generate_load(
+    server: BatchingServer,
+    make_input: Callable[[], np.ndarray],
+    num_requests: int,
+    concurrency: int,
+) -> None:
+    """
+    Synthetic load generator: concurrency clients send requests to the server
+    one after the other, until num_requests requests have been answered.
+    """
+    remaining = num_requests
+
+    async def client() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await server.infer(make_input())
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+
+def benchmark(
+    model_fn: ModelFn,
+    input_shape: tuple[int, ...],
+    num_requests: int = 1000,
+    concurrency: int = 64,
+    max_batch_size: int = 32,
+    max_delay: float = 0.005,
+    workers: int = 1,
+) -> dict[str, float]:
+    """
+    Benchmarks the model behind a BatchingServer with random float32 inputs
+    of the given (unbatched) shape and returns the metrics summary.
+    """
+    rng = np.random.default_rng(0)
+
+    async def run() -> dict[str, float]:
+        server = BatchingServer(model_fn, max_batch_size, max_delay, workers)
+        async with server:
+            await generate_load(
+                server,
+                lambda: rng.standard_normal(input_shape, dtype=np.float32),
+                num_requests,
+                concurrency,
+            )
+        return server.metrics.summary()
+
+    return asyncio.run(run())
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+from blowtorch.export_weights import fold_batch_norms
+from blowtorch.layers import Model
+
+EPS = 1e-3
+
+
+def conv2d(x: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """Valid 2d convolution (cross-correlation, as in Pytorch) of x (C, H, W)."""
+    _, _, kh, kw = weight.shape
+    windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))
+    return np.einsum("chwij,ocij->ohw", windows, weight)
+
+
+def conv2d_transpose(x: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """Transposed 2d convolution with stride 1 of x (C, H, W), weight (C, O, kh, kw)."""
+    _, out_channels, kh, kw = weight.shape
+    _, h, w = x.shape
+    out = np.zeros((out_channels, h + kh - 1, w + kw - 1))
+    for i in range(kh):
+        for j in range(kw):
+            out[:, i : i + h, j : j + w] += np.einsum("chw,co->ohw", x, weight[:, :, i, j])
+    return out
+
+
+def batch_norm(x: np.ndarray, state_dict: dict[str, np.ndarray]) -> np.ndarray:
+    shape = (-1,) + (1,) * (x.ndim - 1)
+    mean = state_dict["layers.norm.running_mean"].reshape(shape)
+    var = state_dict["layers.norm.running_var"].reshape(shape)
+    gamma = state_dict["layers.norm.weight"].reshape(shape)
+    beta = state_dict["layers.norm.bias"].reshape(shape)
+    return (x - mean) / np.sqrt(var + EPS) * gamma + beta
+
+
+def norm_state_dict(rng: np.random.Generator, channels: int) -> dict[str, np.ndarray]:
+    return {
+        "layers.norm.running_mean": rng.normal(size=channels),
+        "layers.norm.running_var": rng.uniform(0.5, 2, size=channels),
+        "layers.norm.weight": rng.normal(size=channels),
+        "layers.norm.bias": rng.normal(size=channels),
+    }
+
+
+CASES = {
+    "Conv2d": (
+        {"in_channels": 3, "out_channels": 4, "kernel_size": "(3,3)"},
+        (4, 3, 3, 3),
+        (3, 6, 6),
+        conv2d,
+        "BatchNorm2d",
+    ),
+    "Conv2dTranspose": (
+        {"in_channels": 3, "out_channels": 4, "kernel_size": "(3,3)"},
+        (3, 4, 3, 3),
+        (3, 5, 5),
+        conv2d_transpose,
+        "BatchNorm2d",
+    ),
+    "Linear": (
+        {"in_features": 5, "out_features": 4},
+        (4, 5),
+        (5,),
+        lambda x, weight: weight @ x,
+        "BatchNorm1d",
+    ),
+}
+
+
+@pytest.mark.parametrize("layer_type", CASES.keys())
+@pytest.mark.parametrize("bias", [False, True])
+def test_folded_weights_match_batch_norm(layer_type, bias):
+    args, weight_shape, input_shape, forward, norm_type = CASES[layer_type]
+    rng = np.random.default_rng(0)
+    model = Model(
+        {
+            "module_name": "Folded",
+            "layers": [
+                {"type": layer_type, "name": "layer", "bias": bias, **args},
+                {"type": norm_type, "name": "norm", "num_features": 4, "eps": EPS},
+            ],
+        }
+    )
+    state_dict = {"layers.layer.weight": rng.normal(size=weight_shape)}
+    if bias:
+        state_dict["layers.layer.bias"] = rng.normal(size=4)
+    state_dict.update(norm_state_dict(rng, 4))
+    x = rng.normal(size=input_shape)
+
+    y = forward(x, state_dict["layers.layer.weight"])
+    if bias:
+        y = y + state_dict["layers.layer.bias"].reshape((-1,) + (1,) * (y.ndim - 1))
+    expected = batch_norm(y, state_dict)
+
+    folded = fold_batch_norms([model], state_dict)
+    bias_shape = (-1,) + (1,) * (y.ndim - 1)
+    actual = forward(x, folded["layers.layer.weight"]) + folded["layers.layer.bias"].reshape(bias_shape)
+    np.testing.assert_allclose(actual, expected, rtol=1e-10, atol=1e-10)
+    # the folded layer always loads a bias
+    assert [w.name for w in model.layers[0].weights if w is not None][-1] == "bias"
+    assert model.layers[0].args_py_inference["bias"] == "True"
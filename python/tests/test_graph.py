@@ -0,0 +1,96 @@
+import json
+import pytest
+
+from blowtorch.generate_models import generate_models
+from blowtorch.layers import Model
+
+# the residual block from docs/model_reference.rst
+RESIDUAL_BLOCK = {
+    "module_name": "ResidualBlock",
+    "layers": [
+        {"type": "Conv2d", "name": "conv1", "in_channels": 8, "out_channels": 8, "kernel_size": "(3,3)", "padding": "same", "bias": True},
+        {"type": "ReLU", "name": "relu1"},
+        {"type": "Conv2d", "name": "conv2", "in_channels": 8, "out_channels": 8, "kernel_size": "(3,3)", "padding": "same", "bias": True},
+        {"type": "Add", "name": "residual", "inputs": ["conv2", "input"]},
+    ],
+}
+
+
+def test_residual_block():
+    model = Model(RESIDUAL_BLOCK)
+    assert model.is_graph
+    assert (model.input_dim, model.output_dim) == (3, 3)
+    assert [n.name for n in model.nodes] == ["conv1", "relu1", "conv2", "residual"]
+    residual = model.nodes[-1]
+    # the residual add reuses the buffer of conv2, the model input is only borrowed
+    assert [(v.name, v.movable) for v in residual.inputs] == [("conv2", True), ("input", False)]
+    assert model.nodes[1].frees == ["conv1"]
+
+
+def test_split_and_concat_order():
+    model = Model(
+        {
+            "module_name": "Branches",
+            "layers": [
+                {"type": "Linear", "name": "fc", "in_features": 4, "out_features": 6, "bias": True},
+                {"type": "Split", "name": "left", "start": 0, "end": 3},
+                {"type": "Split", "name": "right", "inputs": ["fc"], "start": 3, "end": 6},
+                {"type": "Concat", "name": "out", "inputs": ["right", "left"]},
+            ],
+        }
+    )
+    assert (model.input_dim, model.output_dim) == (1, 1)
+    assert [n.name for n in model.nodes] == ["fc", "left", "right", "out"]
+    # fc is used by both splits, so it is freed after the last one
+    assert model.nodes[1].frees == []
+    assert model.nodes[2].frees == ["fc"]
+
+
+def test_only_flexible_layers_on_input():
+    with pytest.raises(ValueError):
+        Model(
+            {
+                "module_name": "Flexible",
+                "layers": [
+                    {"type": "Split", "name": "left", "start": 0, "end": 1},
+                    {"type": "Split", "name": "right", "inputs": ["input"], "start": 1, "end": 2},
+                    {"type": "Add", "name": "sum", "inputs": ["left", "right"]},
+                ],
+            }
+        )
+
+
+@pytest.mark.parametrize(
+    "layers",
+    [
+        # cycle
+        [
+            {"type": "ReLU", "name": "a", "inputs": ["b"]},
+            {"type": "ReLU", "name": "b", "inputs": ["a"]},
+        ],
+        # unused output
+        [
+            {"type": "Linear", "name": "a", "in_features": 2, "out_features": 2, "bias": True},
+            {"type": "ReLU", "name": "unused", "inputs": ["a"]},
+            {"type": "ReLU", "name": "b", "inputs": ["a"]},
+        ],
+        # unknown input
+        [{"type": "Linear", "name": "a", "in_features": 2, "out_features": 2, "bias": True, "inputs": ["b"]}],
+    ],
+)
+def test_invalid_graphs(layers):
+    with pytest.raises(ValueError):
+        Model({"module_name": "Invalid", "layers": layers})
+
+
+def test_render_residual_block(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "spec.json").write_text(json.dumps([RESIDUAL_BLOCK]))
+    generate_models("spec.json")
+
+    models_rs = (tmp_path / "models" / "models.rs").read_text()
+    assert "let x_conv1 = self.conv1.forward_pass(input);" in models_rs
+    assert "drop(x_conv1);" in models_rs
+    assert "let x_residual = x_conv2 + input;" in models_rs
+    models_py = (tmp_path / "models" / "models.py").read_text()
+    assert "x_residual = x_conv2 + x" in models_py
@@ -0,0 +1,28 @@
+import pytest
+
+from blowtorch.layers import parse_layer
+
+
+def conv(kernel_size) -> dict:
+    return {
+        "type": "Conv2d",
+        "name": "conv",
+        "in_channels": 1,
+        "out_channels": 2,
+        "kernel_size": kernel_size,
+        "bias": True,
+    }
+
+
+@pytest.mark.parametrize("kernel_size, expected", [("(3,3)", (3, 3)), ("(1, 5)", (1, 5))])
+def test_kernel_size(kernel_size, expected):
+    layer = parse_layer(conv(kernel_size))
+    assert layer.kernel_size == expected
+    assert layer.weights[0].shape == str((2, 1) + expected)
+
+
+@pytest.mark.parametrize("kernel_size", ["3", "(3)", "(3,3,3)", "(a,3)", 3])
+def test_invalid_kernel_size(kernel_size):
+    # specifications that skip validation get a clear error instead of a parsing error
+    with pytest.raises(ValueError, match="Layer\\[conv\\]"):
+        parse_layer(conv(kernel_size))
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+from blowtorch.export_weights import _export_weights_of, pack_weight
+from blowtorch.layers import Model
+from blowtorch.pruning import prune_models
+
+
+def make_spec(sparse_nnz=None) -> list[dict]:
+    hidden = {"type": "Linear", "name": "fc2", "in_features": 8, "out_features": 5, "bias": True}
+    if sparse_nnz is not None:
+        hidden.update(sparse=True, nnz=sparse_nnz)
+    return [
+        {
+            "module_name": "Mlp",
+            "layers": [
+                {"type": "Linear", "name": "fc1", "in_features": 6, "out_features": 8, "bias": True},
+                {"type": "ReLU", "name": "relu1"},
+                hidden,
+                {"type": "ReLU", "name": "relu2"},
+                {"type": "Linear", "name": "fc3", "in_features": 5, "out_features": 3, "bias": False},
+            ],
+        }
+    ]
+
+
+def make_state_dict() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(0)
+    state_dict = {
+        "layers.fc1.weight": rng.normal(size=(8, 6)).astype(np.float32),
+        "layers.fc1.bias": rng.normal(size=8).astype(np.float32),
+        "layers.fc2.weight": rng.normal(size=(5, 8)).astype(np.float32),
+        "layers.fc2.bias": rng.normal(size=5).astype(np.float32),
+        "layers.fc3.weight": rng.normal(size=(3, 5)).astype(np.float32),
+    }
+    # fc1 never outputs channels 1 and 4, fc3 does not use channel 2 of fc2
+    state_dict["layers.fc1.weight"][[1, 4]] = 0
+    state_dict["layers.fc1.bias"][[1, 4]] = 0
+    state_dict["layers.fc3.weight"][:, 2] = 0
+    # fc2 is mostly zero
+    state_dict["layers.fc2.weight"][rng.random((5, 8)) < 0.7] = 0
+    return state_dict
+
+
+def reference_forward(state_dict: dict[str, np.ndarray], x: np.ndarray) -> np.ndarray:
+    x = np.maximum(state_dict["layers.fc1.weight"] @ x + state_dict["layers.fc1.bias"], 0)
+    x = np.maximum(state_dict["layers.fc2.weight"] @ x + state_dict["layers.fc2.bias"], 0)
+    return state_dict["layers.fc3.weight"] @ x
+
+
+def exported_forward(specifications: list[dict], state_dict: dict[str, np.ndarray], x: np.ndarray):
+    """Exports the weights like export does, and runs the model on the exported weights."""
+    model = Model(specifications[0])
+    exported = {}
+    for key, source, weight in _export_weights_of([model]):
+        exported[key] = pack_weight(state_dict[source], weight)
+        assert str(exported[key].shape) == weight.shape, key
+    for layer in model.layers:
+        if layer.type_py == "ReLU":
+            x = np.maximum(x, 0)
+            continue
+        key = f"layers.{layer.name}"
+        if layer.sparse:
+            data, indices = exported[f"{key}.weight_data"], exported[f"{key}.weight_indices"]
+            indptr = exported[f"{key}.weight_indptr"]
+            x = np.array(
+                [data[s:e] @ x[indices[s:e]] for s, e in zip(indptr[:-1], indptr[1:])]
+            )
+        else:
+            # packed as (in_features, out_features)
+            x = x @ exported[f"{key}.weight"]
+        if f"{key}.bias" in exported:
+            x = x + exported[f"{key}.bias"]
+    return x
+
+
+@pytest.mark.parametrize(
+    "sparse_nnz, sparse_threshold",
+    [(None, None), (None, 0.5), (40, None)],  # 40 is the stale nnz of the unpruned layer
+)
+def test_pruned_export_matches_dense(sparse_nnz, sparse_threshold):
+    state_dict = make_state_dict()
+    specifications, pruned_state_dict = prune_models(
+        make_spec(sparse_nnz), state_dict, structured=True, sparse_threshold=sparse_threshold
+    )
+    layers = {l["name"]: l for l in specifications[0]["layers"]}
+    assert layers["fc1"]["out_features"] == 6
+    assert layers["fc2"]["in_features"] == 6
+    assert layers["fc2"]["out_features"] == 4
+    assert layers["fc3"]["in_features"] == 4
+    if sparse_nnz is not None or sparse_threshold is not None:
+        assert layers["fc2"]["sparse"]
+        assert layers["fc2"]["nnz"] == np.count_nonzero(pruned_state_dict["layers.fc2.weight"])
+
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        x = rng.normal(size=6).astype(np.float32)
+        np.testing.assert_allclose(
+            exported_forward(specifications, pruned_state_dict, x),
+            reference_forward(state_dict, x),
+            rtol=1e-5,
+            atol=1e-5,
+        )
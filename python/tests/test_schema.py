@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+import pytest
+
+from blowtorch import generate_models
+from blowtorch.generate_models import get_validator, load_specification, specification_hash
+
+REPOSITORY = Path(__file__).parents[2]
+
+
+def errors(layer: dict) -> list:
+    return list(get_validator().iter_errors([{"module_name": "Module", "layers": [layer]}]))
+
+
+@pytest.mark.parametrize(
+    "spec", [REPOSITORY / "tests/mnist_test/mnist.json", REPOSITORY / "examples/mnist/mnist.json"]
+)
+def test_valid_specifications(spec):
+    get_validator().validate(json.loads(spec.read_text()))
+
+
+@pytest.mark.parametrize(
+    "layer",
+    [
+        {"type": "Split", "name": "split"},
+        {"type": "Split", "name": "split", "start": 0},
+        {"type": "Add", "name": "add"},
+        {"type": "Concat", "name": "concat"},
+        {"type": "BatchNorm2d", "name": "norm"},
+        {"type": "Linear", "name": "fc", "in_features": 2, "bias": True},
+        {"type": "Linear", "name": "fc", "in_features": 2, "out_features": 2},
+        {"type": "Conv2d", "name": "conv", "in_channels": 1, "out_channels": 1, "kernel_size": "3", "bias": True},
+        {"type": "Conv2dTranspose", "name": "conv", "in_channels": 1, "out_channels": 1, "bias": True},
+    ],
+)
+def test_missing_or_invalid_parameters(layer):
+    assert errors(layer)
+
+
+@pytest.mark.parametrize(
+    "layer",
+    [
+        {"type": "ReLU", "name": "relu"},
+        {"type": "Split", "name": "split", "start": 0, "end": 2},
+        {"type": "Add", "name": "add", "inputs": ["a", "b"]},
+        {"type": "BatchNorm1d", "name": "norm", "num_features": 4, "eps": 1e-3},
+    ],
+)
+def test_valid_layers(layer):
+    assert not errors(layer)
+
+
+def test_specification_is_read_once(tmp_path, monkeypatch):
+    spec = REPOSITORY / "tests/mnist_test/mnist.json"
+    specifications, digest = load_specification(spec)
+    assert digest == specification_hash(spec)
+    assert specifications == json.loads(spec.read_text())
+
+    reads = []
+    read_specification = generate_models._read_specification
+    monkeypatch.setattr(
+        generate_models, "_read_specification", lambda path: reads.append(path) or read_specification(path)
+    )
+    monkeypatch.chdir(tmp_path)
+    generate_models.generate_models(spec)
+    assert reads == [spec]
+    assert digest in (tmp_path / "models/models.rs").read_text()
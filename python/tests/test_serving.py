@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+
+from blowtorch.serving import BatchingServer, ServingMetrics
+
+
+def test_batches_results():
+    async def run():
+        async with BatchingServer(lambda batch: batch * 2, max_batch_size=4) as server:
+            inputs = [np.full(3, i, dtype=np.float32) for i in range(10)]
+            return inputs, await asyncio.gather(*(server.infer(x) for x in inputs)), server.metrics
+
+    inputs, outputs, metrics = asyncio.run(run())
+    for x, y in zip(inputs, outputs):
+        np.testing.assert_array_equal(y, x * 2)
+    assert sum(metrics.batch_sizes) == 10
+    assert max(metrics.batch_sizes) <= 4
+
+
+def test_deadline_starts_at_submission():
+    # the first request waits for the busy worker, its batch must not wait another max_delay
+    release = threading.Event()
+    max_delay = 0.5
+
+    def model_fn(batch):
+        release.wait()
+        return batch
+
+    async def run():
+        async with BatchingServer(model_fn, max_batch_size=2, max_delay=max_delay) as server:
+            # fills the first batch, which blocks the only worker
+            first = asyncio.gather(server.infer(np.zeros(1)), server.infer(np.zeros(1)))
+            await asyncio.sleep(0.01)
+            waiting = asyncio.create_task(server.infer(np.ones(1)))
+            await asyncio.sleep(max_delay)
+            release.set()
+            await first
+            started = time.perf_counter()
+            await waiting
+            return time.perf_counter() - started
+
+    assert asyncio.run(run()) < max_delay / 2
+
+
+def test_missing_outputs_fail():
+    async def run():
+        async with BatchingServer(lambda batch: batch[:1], max_batch_size=2, max_delay=0.1) as server:
+            return await asyncio.wait_for(
+                asyncio.gather(server.infer(np.zeros(1)), server.infer(np.zeros(1))), timeout=5
+            )
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_requests_while_stopping_fail():
+    release = threading.Event()
+
+    def model_fn(batch):
+        release.wait()
+        return batch
+
+    async def run():
+        server = BatchingServer(model_fn, max_batch_size=1, max_delay=0)
+        await server.start()
+        first = asyncio.create_task(server.infer(np.zeros(1)))
+        await asyncio.sleep(0.01)
+        stopping = asyncio.create_task(server.stop())
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(RuntimeError):
+                await asyncio.wait_for(server.infer(np.ones(1)), timeout=1)
+        finally:
+            release.set()
+            await stopping
+        return await first
+
+    np.testing.assert_array_equal(asyncio.run(run()), np.zeros(1))
+
+
+def test_metrics_window():
+    metrics = ServingMetrics(window=3)
+    for i in range(5):
+        metrics.record_request(float(i), i + 0.5)
+    assert list(metrics.latencies) == [0.5] * 3
+    assert metrics.summary()["requests"] == 5
+    assert metrics.throughput == 5 / 4.5
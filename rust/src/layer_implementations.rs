@@ -6,6 +6,7 @@ use crate::{
     activation_functions::{GdnLayer, IgdnLayer, ReluLayer},
     flatten::Flatten,
     linear::LinearLayer,
+    sparse_linear::SparseLinearLayer,
     traits::{FloatLikePrimitive, Layer},
 };
 use convolutions_rs::{
@@ -29,6 +30,11 @@ impl<F: FloatLikePrimitive> Layer<Array1<F>, Array1<F>> for LinearLayer<F> {
         self.linear(input)
     }
 }
+impl<F: FloatLikePrimitive> Layer<Array1<F>, Array1<F>> for SparseLinearLayer<F> {
+    fn forward_pass(&self, input: &Array1<F>) -> Array1<F> {
+        self.linear(input)
+    }
+}
 impl<F: FloatLikePrimitive> Layer<Array3<F>, Array3<F>> for GdnLayer<F> {
     fn forward_pass(&self, input: &Array3<F>) -> Array3<F> {
         self.activate(input)
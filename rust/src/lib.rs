@@ -1,6 +1,8 @@
 mod activation_functions;
 mod layer_implementations;
 mod linear;
+mod manifest;
+mod sparse_linear;
 mod flatten;
 mod traits;
 mod weight_loader;
@@ -14,10 +16,15 @@ pub mod nn {
         pub use convolutions_rs::Padding;
     }
     pub mod loading {
-        pub use crate::weight_loader::{NpzWeightLoader, WeightLoader};
+        pub use crate::manifest::{
+            verify_weights, verify_weights_buffer, ExpectedDtype, ExpectedWeight, Manifest,
+            ManifestEntry,
+        };
+        pub use crate::weight_loader::{NpzWeightLoader, WeightError, WeightLoader};
     }
     pub use crate::activation_functions::ReluLayer;
     pub use crate::traits::{FloatLikePrimitive, Layer};
     pub use crate::flatten::Flatten;
     pub use crate::linear::LinearLayer;
+    pub use crate::sparse_linear::SparseLinearLayer;
 }
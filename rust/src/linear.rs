@@ -7,16 +7,27 @@ use num_traits::Float;
 /// Rust implementation of a linear layer.
 
 pub struct LinearLayer<F: Float> {
-    /// Weight matrix of the kernel
+    /// Weight matrix of the kernel, packed as (in_features, out_features)
     pub(in crate) weights: Array2<F>,
     pub(in crate) bias: Option<Array1<F>>,
 }
 
 impl<F: 'static + Float + std::ops::AddAssign> LinearLayer<F> {
     /// Creates new linear layer.
-    /// The weights are given in Pytorch layout.
+    /// The weights are given in Pytorch layout (out_features, in_features)
+    /// and are transposed once on creation.
 
     pub fn new(weights_array: Array2<F>, bias_array: Option<Array1<F>>) -> LinearLayer<F> {
+        LinearLayer::new_packed(
+            weights_array.reversed_axes().as_standard_layout().into_owned(),
+            bias_array,
+        )
+    }
+
+    /// Creates new linear layer from weights that are already packed
+    /// in the layout the layer consumes, (in_features, out_features).
+    /// This is the layout that blowtorch exports the weights in.
+    pub fn new_packed(weights_array: Array2<F>, bias_array: Option<Array1<F>>) -> LinearLayer<F> {
         LinearLayer {
             weights: weights_array,
             bias: bias_array,
@@ -33,7 +44,7 @@ impl<F: 'static + Float + std::ops::AddAssign> LinearLayer<F> {
 
 /// Input:
 /// -----------------------------------------------
-/// - kernel_weights: weights of shape (F, C)
+/// - kernel_weights: weights of shape (C, F)
 /// - im2d: Input data of shape (C, D)
 
 /// Returns:
@@ -58,7 +69,7 @@ where
 
     let kernel_weights_arr: ArrayView2<F> = kernel_weights.into();
 
-    let mul = im2d_arr.dot(&kernel_weights_arr.t());
+    let mul = im2d_arr.dot(&kernel_weights_arr);
     let output_array = add_bias(&mul, bias);
     let flatten_output: Array1<F> = Array::from_iter(output_array.map(|a| *a));
     flatten_output
@@ -179,4 +190,45 @@ mod tests {
             output
         );
     }
+
+    #[test]
+    fn test_linear_packed() {
+        let test_img: Array1<f32> = Array::from_shape_vec(
+            12,
+            vec![
+                -1.0643, -0.8746, -0.5266, 0.6039, 0.7219, -0.8092, 0.1590, -0.2309, 0.6337,
+                -1.4233, 0.7101, -0.9875,
+            ],
+        )
+        .unwrap();
+
+        let kernel: Array2<f32> = Array::from_shape_vec(
+            (4, 12),
+            vec![
+                0.0379, 0.1877, 0.2359, 0.0712, 0.0907, -0.0815, 0.1697, -0.0474, -0.0823, -0.1261,
+                -0.1167, 0.0740, 0.2609, -0.0292, -0.2330, 0.1270, -0.0309, -0.2788, 0.1672,
+                -0.1382, -0.2816, 0.2592, 0.0464, -0.2120, -0.0236, -0.1604, -0.1838, -0.1979,
+                -0.1971, 0.0578, -0.0632, 0.1702, 0.2735, 0.1344, -0.1922, -0.0913, 0.0733, 0.0641,
+                0.0564, -0.2869, -0.1568, 0.2572, -0.0046, -0.1427, 0.0275, -0.0283, -0.1056,
+                0.2554,
+            ],
+        )
+        .unwrap();
+        // same layout as written by the exporter: transposed and row-major
+        let packed_kernel = kernel.t().as_standard_layout().into_owned();
+
+        let linear_layer = LinearLayer::new_packed(
+            packed_kernel,
+            Some(Array::from_shape_vec((4,), vec![0.0487, -0.1376, -0.2240, -0.1867]).unwrap()),
+        );
+        let linear_output = linear_layer.linear(&test_img);
+        let output: Array1<f32> =
+            Array::from_shape_vec((4), vec![-0.0964, -0.2336, -0.3842, -1.0823]).unwrap();
+        assert!(
+            arr_allclose(&linear_output, &output),
+            "{:?} was not equal to {:?}",
+            linear_output,
+            output
+        );
+    }
 }
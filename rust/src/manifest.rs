@@ -0,0 +1,344 @@
+//! Verifies exported weight files against the manifest that blowtorch writes into
+//! the npz archive on export. The manifest records the hash of the specification and
+//! the key, dtype, shape and xxhash of every weight.
+//!
+//! The structure (specification hash, keys, dtypes and shapes) is checked from the manifest
+//! alone, without reading any weights. The weight data can optionally be checked
+//! against the hashes, which is done in parallel.
+use crate::traits::FloatLikePrimitive;
+use crate::weight_loader::{WeightError, WeightResult};
+use serde::Deserialize;
+use std::collections::HashMap;
+use std::fs::File;
+use std::io::{Cursor, Read, Seek};
+use std::path::Path;
+use std::thread;
+use xxhash_rust::xxh3::xxh3_64;
+use zip::ZipArchive;
+
+/// Name of the manifest in the npz archive.
+pub const MANIFEST_NAME: &str = "manifest.json";
+
+/// Element type that the generated models expect for a weight.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum ExpectedDtype {
+    /// The float type the models are instantiated with
+    Float,
+    /// 64 bit integers, used for the indices of sparse weights
+    Int64,
+}
+
+impl ExpectedDtype {
+    /// Returns the numpy type string of the dtype without byte order (e.g. "f4"),
+    /// for models with float type F.
+    fn numpy_kind<F: FloatLikePrimitive>(self) -> String {
+        match self {
+            ExpectedDtype::Float => format!("f{}", std::mem::size_of::<F>()),
+            ExpectedDtype::Int64 => "i8".to_string(),
+        }
+    }
+}
+
+/// A weight that the generated models load, with the dtype and shape they expect.
+#[derive(Debug, Clone, Copy)]
+pub struct ExpectedWeight {
+    pub key: &'static str,
+    pub dtype: ExpectedDtype,
+    pub shape: &'static [usize],
+}
+
+/// Entry of the manifest for one exported weight.
+#[derive(Debug, Clone, Deserialize)]
+pub struct ManifestEntry {
+    pub key: String,
+    /// Numpy type string of the weight, e.g. "<f4"
+    pub dtype: String,
+    pub shape: Vec<usize>,
+    /// Offset of the weight data in the .npy file of the weight (the size of its header)
+    pub offset: usize,
+    /// xxh3 (64 bit) hash of the weight data as hex string
+    pub xxhash: String,
+}
+
+/// Manifest of an exported weight file.
+#[derive(Debug, Clone, Deserialize)]
+pub struct Manifest {
+    /// Hash of the specification the weights were exported for
+    pub spec_hash: String,
+    pub weights: Vec<ManifestEntry>,
+}
+
+impl ManifestEntry {
+    /// Checks the data of the weight in the archive against its hash.
+    fn verify_data<R: Read + Seek>(&self, archive: &mut ZipArchive<R>) -> WeightResult<()> {
+        let mut bytes = Vec::new();
+        archive
+            .by_name(&format!("{}.npy", self.key))
+            .map_err(|_| WeightError::WeightKeyError(self.key.clone()))?
+            .read_to_end(&mut bytes)?;
+        let data = bytes.get(self.offset..).unwrap_or(&[]);
+        if format!("{:016x}", xxh3_64(data)) != self.xxhash {
+            return Err(WeightError::WeightManifestError(format!(
+                "data of weight {} does not match its hash, the weight file is corrupted",
+                self.key
+            )));
+        }
+        Ok(())
+    }
+}
+
+impl Manifest {
+    /// Reads the manifest from the npz archive.
+    pub fn from_archive<R: Read + Seek>(archive: &mut ZipArchive<R>) -> WeightResult<Manifest> {
+        let mut content = String::new();
+        archive
+            .by_name(MANIFEST_NAME)
+            .map_err(|_| {
+                WeightError::WeightManifestError(format!(
+                    "no {} found, the weights have to be exported again",
+                    MANIFEST_NAME
+                ))
+            })?
+            .read_to_string(&mut content)?;
+        serde_json::from_str(&content).map_err(|e| {
+            WeightError::WeightManifestError(format!("{} not readable: {}", MANIFEST_NAME, e))
+        })
+    }
+
+    /// Checks that the weights were exported for the specification with the given hash,
+    /// and that every expected weight is present with the expected dtype (for models
+    /// with float type F) and shape.
+    /// Only the manifest is used, so this takes O(number of weights).
+    pub fn verify_structure<F: FloatLikePrimitive>(
+        &self,
+        spec_hash: &str,
+        expected: &[ExpectedWeight],
+    ) -> WeightResult<()> {
+        if self.spec_hash != spec_hash {
+            return Err(WeightError::WeightManifestError(format!(
+                "weights were exported for specification {}, but the models were generated from {}",
+                self.spec_hash, spec_hash
+            )));
+        }
+        let entries: HashMap<&str, &ManifestEntry> = self
+            .weights
+            .iter()
+            .map(|entry| (entry.key.as_str(), entry))
+            .collect();
+        for weight in expected {
+            let entry = entries
+                .get(weight.key)
+                .ok_or_else(|| WeightError::WeightKeyError(weight.key.to_string()))?;
+            // the byte order does not matter, the npy reader converts it
+            let kind = weight.dtype.numpy_kind::<F>();
+            if entry.dtype.trim_start_matches(['<', '>', '=', '|']) != kind {
+                return Err(WeightError::WeightManifestError(format!(
+                    "weight {} has dtype {}, but the models expect {}",
+                    weight.key, entry.dtype, kind
+                )));
+            }
+            if entry.shape != weight.shape {
+                return Err(WeightError::WeightManifestError(format!(
+                    "weight {} has shape {:?}, but the models expect {:?}",
+                    weight.key, entry.shape, weight.shape
+                )));
+            }
+        }
+        Ok(())
+    }
+
+    /// Checks the data of all weights against their hashes. The weights are split
+    /// among all available cores, and every thread reads its weights through
+    /// its own archive that is returned by open.
+    pub fn verify_data<R, O>(&self, open: O) -> WeightResult<()>
+    where
+        R: Read + Seek,
+        O: Fn() -> WeightResult<ZipArchive<R>> + Sync,
+    {
+        let threads = thread::available_parallelism().map_or(1, |n| n.get());
+        let chunk_size = ((self.weights.len() + threads - 1) / threads).max(1);
+        let open = &open;
+        thread::scope(|scope| {
+            let handles: Vec<_> = self
+                .weights
+                .chunks(chunk_size)
+                .map(|entries| {
+                    scope.spawn(move || -> WeightResult<()> {
+                        let mut archive = open()?;
+                        for entry in entries {
+                            entry.verify_data(&mut archive)?;
+                        }
+                        Ok(())
+                    })
+                })
+                .collect();
+            handles
+                .into_iter()
+                .try_for_each(|handle| handle.join().expect("Weight verification panicked"))
+        })
+    }
+}
+
+/// Verifies the weights in the archive against the manifest, see verify_weights.
+fn verify_archive<F, R, O>(
+    open: O,
+    spec_hash: &str,
+    expected: &[ExpectedWeight],
+    verify_data: bool,
+) -> WeightResult<()>
+where
+    F: FloatLikePrimitive,
+    R: Read + Seek,
+    O: Fn() -> WeightResult<ZipArchive<R>> + Sync,
+{
+    let manifest = Manifest::from_archive(&mut open()?)?;
+    manifest.verify_structure::<F>(spec_hash, expected)?;
+    if verify_data {
+        manifest.verify_data(open)?;
+    }
+    Ok(())
+}
+
+/// Verifies that the npz weight file at the given path was exported for the models
+/// that were generated from the specification with the given hash, and that it
+/// contains all expected weights with the expected dtypes (for models with float
+/// type F) and shapes. This only reads the manifest.
+///
+/// If verify_data is set to true, additionally checks the data of every weight against
+/// its hash in the manifest (in parallel), which reads the whole file.
+pub fn verify_weights<F: FloatLikePrimitive, P: AsRef<Path>>(
+    path: P,
+    spec_hash: &str,
+    expected: &[ExpectedWeight],
+    verify_data: bool,
+) -> WeightResult<()> {
+    let path = path.as_ref();
+    verify_archive::<F, _, _>(
+        || Ok(ZipArchive::new(File::open(path)?)?),
+        spec_hash,
+        expected,
+        verify_data,
+    )
+}
+
+/// Like verify_weights, for npz weights in a byte array.
+pub fn verify_weights_buffer<F: FloatLikePrimitive>(
+    bytes_array: &[u8],
+    spec_hash: &str,
+    expected: &[ExpectedWeight],
+    verify_data: bool,
+) -> WeightResult<()> {
+    verify_archive::<F, _, _>(
+        || Ok(ZipArchive::new(Cursor::new(bytes_array))?),
+        spec_hash,
+        expected,
+        verify_data,
+    )
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use ndarray::{array, ArrayD};
+    use ndarray_npy::WriteNpyExt;
+    use std::io::Write;
+    use zip::write::FileOptions;
+    use zip::{CompressionMethod, ZipWriter};
+
+    const EXPECTED: &[ExpectedWeight] = &[
+        ExpectedWeight {
+            key: "a",
+            dtype: ExpectedDtype::Float,
+            shape: &[2, 3],
+        },
+        ExpectedWeight {
+            key: "b",
+            dtype: ExpectedDtype::Float,
+            shape: &[3],
+        },
+    ];
+
+    /// Writes the arrays together with their manifest into an npz archive,
+    /// like the blowtorch export does.
+    fn write_npz(arrays: &[(&str, ArrayD<f32>)], spec_hash: &str) -> Vec<u8> {
+        let mut writer = ZipWriter::new(Cursor::new(Vec::new()));
+        let options = FileOptions::default().compression_method(CompressionMethod::Deflated);
+        let mut entries = Vec::new();
+        for (key, array) in arrays {
+            let mut npy = Vec::new();
+            array.write_npy(&mut npy).unwrap();
+            let offset = npy.len() - array.len() * std::mem::size_of::<f32>();
+            entries.push(format!(
+                r#"{{"key": "{}", "dtype": "<f4", "shape": {:?}, "offset": {}, "xxhash": "{:016x}"}}"#,
+                key,
+                array.shape(),
+                offset,
+                xxh3_64(&npy[offset..])
+            ));
+            writer.start_file(format!("{}.npy", key), options).unwrap();
+            writer.write_all(&npy).unwrap();
+        }
+        writer.start_file(MANIFEST_NAME, options).unwrap();
+        write!(
+            writer,
+            r#"{{"spec_hash": "{}", "weights": [{}]}}"#,
+            spec_hash,
+            entries.join(", ")
+        )
+        .unwrap();
+        writer.finish().unwrap().into_inner()
+    }
+
+    fn test_arrays(a: ArrayD<f32>) -> Vec<(&'static str, ArrayD<f32>)> {
+        vec![("a", a), ("b", array![7., 8., 9.].into_dyn())]
+    }
+
+    #[test]
+    fn test_verify_weights() {
+        let bytes = write_npz(
+            &test_arrays(array![[1., 2., 3.], [4., 5., 6.]].into_dyn()),
+            "spec",
+        );
+        verify_weights_buffer::<f32>(&bytes, "spec", EXPECTED, true).unwrap();
+    }
+
+    #[test]
+    fn test_verify_weights_wrong_spec() {
+        let bytes = write_npz(
+            &test_arrays(array![[1., 2., 3.], [4., 5., 6.]].into_dyn()),
+            "other",
+        );
+        assert!(verify_weights_buffer::<f32>(&bytes, "spec", EXPECTED, false).is_err());
+    }
+
+    #[test]
+    fn test_verify_weights_wrong_shape() {
+        let bytes = write_npz(&test_arrays(array![[1., 2.], [4., 5.]].into_dyn()), "spec");
+        assert!(verify_weights_buffer::<f32>(&bytes, "spec", EXPECTED, false).is_err());
+    }
+
+    #[test]
+    fn test_verify_weights_wrong_dtype() {
+        let bytes = write_npz(
+            &test_arrays(array![[1., 2., 3.], [4., 5., 6.]].into_dyn()),
+            "spec",
+        );
+        assert!(verify_weights_buffer::<f64>(&bytes, "spec", EXPECTED, false).is_err());
+    }
+
+    #[test]
+    fn test_verify_weights_corrupted_data() {
+        let bytes = write_npz(
+            &test_arrays(array![[1., 2., 3.], [4., 5., 6.]].into_dyn()),
+            "spec",
+        );
+        let mut archive = ZipArchive::new(Cursor::new(bytes.as_slice())).unwrap();
+        let mut manifest = Manifest::from_archive(&mut archive).unwrap();
+        manifest.weights[1].xxhash = format!("{:016x}", 0);
+
+        manifest.verify_structure::<f32>("spec", EXPECTED).unwrap();
+        assert!(manifest
+            .verify_data(|| Ok(ZipArchive::new(Cursor::new(bytes.as_slice()))?))
+            .is_err());
+    }
+}
@@ -0,0 +1,167 @@
+//! Contains the implementation of a linear layer whose weight matrix is sparse.
+//! The weights are stored in compressed sparse row (CSR) format, so only
+//! the non-zero weights are stored and multiplied.
+//! See <https://docs.scipy.org/doc/scipy/reference/generated/scipy.sparse.csr_matrix.html>
+use ndarray::*;
+use num_traits::Float;
+
+/// Rust implementation of a sparse linear layer.
+pub struct SparseLinearLayer<F: Float> {
+    /// Non-zero weights, row by row
+    data: Array1<F>,
+    /// Column (input feature) of every non-zero weight
+    indices: Vec<usize>,
+    /// Row i (output feature i) has the non-zero weights indptr[i]..indptr[i + 1]
+    indptr: Vec<usize>,
+    bias: Option<Array1<F>>,
+    in_features: usize,
+}
+
+impl<F: 'static + Float + std::ops::AddAssign> SparseLinearLayer<F> {
+    /// Creates new sparse linear layer from the CSR representation
+    /// of the Pytorch weight matrix (out_features, in_features).
+    ///
+    /// Panics if the representation is inconsistent.
+    pub fn new(
+        data: Array1<F>,
+        indices: Array1<i64>,
+        indptr: Array1<i64>,
+        bias: Option<Array1<F>>,
+        in_features: usize,
+    ) -> SparseLinearLayer<F> {
+        assert_eq!(
+            data.len(),
+            indices.len(),
+            "Sparse weights have {} values, but {} indices",
+            data.len(),
+            indices.len()
+        );
+        let indices: Vec<usize> = indices
+            .iter()
+            .map(|&i| {
+                assert!(
+                    i >= 0 && (i as usize) < in_features,
+                    "Sparse weight index {} out of range for {} input features",
+                    i,
+                    in_features
+                );
+                i as usize
+            })
+            .collect();
+        let indptr: Vec<usize> = indptr.iter().map(|&i| i as usize).collect();
+        assert!(
+            !indptr.is_empty()
+                && indptr[0] == 0
+                && indptr.windows(2).all(|w| w[0] <= w[1])
+                && indptr[indptr.len() - 1] == data.len(),
+            "Sparse weight row pointers {:?} do not fit {} values",
+            indptr,
+            data.len()
+        );
+        if let Some(bias_array) = &bias {
+            assert_eq!(
+                bias_array.len(),
+                indptr.len() - 1,
+                "Bias array has the wrong shape {:?} for {} output features",
+                bias_array.shape(),
+                indptr.len() - 1
+            );
+        }
+        SparseLinearLayer {
+            data,
+            indices,
+            indptr,
+            bias,
+            in_features,
+        }
+    }
+
+    /// Number of output features of the layer.
+    pub fn out_features(&self) -> usize {
+        self.indptr.len() - 1
+    }
+
+    /// Analog to nn.Linear.
+    pub fn linear(&self, input_array: &Array1<F>) -> Array1<F> {
+        assert_eq!(
+            input_array.len(),
+            self.in_features,
+            "Input has {} features, but the layer expects {}",
+            input_array.len(),
+            self.in_features
+        );
+        let mut output = match &self.bias {
+            Some(bias_array) => bias_array.clone(),
+            None => Array1::zeros(self.out_features()),
+        };
+        for (row, out) in output.iter_mut().enumerate() {
+            let mut acc = F::zero();
+            for k in self.indptr[row]..self.indptr[row + 1] {
+                acc += self.data[k] * input_array[self.indices[k]];
+            }
+            *out += acc;
+        }
+        output
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::linear::LinearLayer;
+
+    /// CSR representation of a dense matrix, as exported by blowtorch
+    fn to_csr(dense: &Array2<f32>) -> (Array1<f32>, Array1<i64>, Array1<i64>) {
+        let mut data = Vec::new();
+        let mut indices = Vec::new();
+        let mut indptr = vec![0];
+        for row in dense.rows() {
+            for (j, &v) in row.iter().enumerate() {
+                if v != 0.0 {
+                    data.push(v);
+                    indices.push(j as i64);
+                }
+            }
+            indptr.push(data.len() as i64);
+        }
+        (
+            Array1::from_vec(data),
+            Array1::from_vec(indices),
+            Array1::from_vec(indptr),
+        )
+    }
+
+    #[test]
+    fn test_sparse_linear() {
+        let test_img: Array1<f32> = array![
+            -1.0643, -0.8746, -0.5266, 0.6039, 0.7219, -0.8092, 0.1590, -0.2309
+        ];
+        let kernel: Array2<f32> = array![
+            [0.0379, 0.0, 0.0, 0.0712, 0.0, -0.0815, 0.0, 0.0],
+            [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+            [0.0, -0.1604, 0.0, -0.1979, 0.0, 0.0, 0.0, 0.1702],
+            [0.2735, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0564, 0.0]
+        ];
+        let bias: Array1<f32> = array![0.0487, -0.1376, -0.2240, -0.1867];
+
+        let (data, indices, indptr) = to_csr(&kernel);
+        let sparse_layer = SparseLinearLayer::new(data, indices, indptr, Some(bias.clone()), 8);
+        let dense_layer = LinearLayer::new(kernel, Some(bias));
+
+        let sparse_output = sparse_layer.linear(&test_img);
+        let dense_output = dense_layer.linear(&test_img);
+        assert!(
+            (&sparse_output - &dense_output).map(|x| x.abs()).sum() < 1e-5,
+            "{:?} was not equal to {:?}",
+            sparse_output,
+            dense_output
+        );
+    }
+
+    #[test]
+    #[should_panic]
+    fn test_sparse_linear_wrong_indptr() {
+        let (data, indices, _) = to_csr(&array![[1.0, 0.0], [0.0, 2.0]]);
+        SparseLinearLayer::new(data, indices, array![0, 1], None, 2);
+    }
+}
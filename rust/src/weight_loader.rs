@@ -7,7 +7,7 @@ use std::io::{Cursor, Read, Seek};
 use std::{fs, path::Path};
 use thiserror::Error;
 
-type WeightResult<T> = Result<T, WeightError>;
+pub(crate) type WeightResult<T> = Result<T, WeightError>;
 
 /// Error type for the weight loader.
 #[derive(Error, Debug)]
@@ -22,6 +22,10 @@ pub enum WeightError {
     WeightFileNpzError(#[from] ReadNpzError),
     #[error("Wrong shape for weight:\n {0}.")]
     WeightShapeError(#[from] ShapeError),
+    #[error("Weight file not readable as zip archive. Reported error\n {0}.")]
+    WeightFileZipError(#[from] zip::result::ZipError),
+    #[error("Weight file does not fit the models: {0}.")]
+    WeightManifestError(String),
 }
 
 pub trait WeightLoader {
@@ -42,18 +46,25 @@ pub trait WeightLoader {
 /// Object to load weights that are in NPZ format.
 /// It can read from any readable, seekable object that contains npz data,
 /// this might be files, temp files, byte arrays, ...
+///
+/// Both plain and compressed npz files (`np.savez_compressed`) are supported.
+/// Every array is stored as its own member in the npz archive, so a member
+/// is only read (and decompressed) when it is requested via `get_weight`,
+/// directly into the returned array.
 pub struct NpzWeightLoader<R>
 where
     R: Seek + Read,
 {
-    handle: R,
+    reader: NpzReader<R>,
 }
 
 impl NpzWeightLoader<std::fs::File> {
     /// Returns a weight loader from a given path
     pub fn from_path<P: AsRef<Path>>(path: P) -> WeightResult<NpzWeightLoader<std::fs::File>> {
         let handle = std::fs::File::open(path)?;
-        Ok(NpzWeightLoader { handle })
+        Ok(NpzWeightLoader {
+            reader: NpzReader::new(handle)?,
+        })
     }
 }
 
@@ -61,7 +72,7 @@ impl NpzWeightLoader<Cursor<&[u8]>> {
     /// Returns a weight loader from a byte array
     pub fn from_buffer(bytes_array: &[u8]) -> WeightResult<NpzWeightLoader<Cursor<&[u8]>>> {
         Ok(NpzWeightLoader {
-            handle: Cursor::new(bytes_array),
+            reader: NpzReader::new(Cursor::new(bytes_array))?,
         })
     }
 }
@@ -84,11 +95,9 @@ where
         D: Dimension,
         Sh: Into<StrideShape<D>>,
     {
-        // The reader in the npy package has to be mut, so we recreate.
-        // Else get_weight would have to be mutable (or we have to put it
-        // into a RefCell). I dislike both solutions
-        // We hope that this doesn't hurt perforrmance, we'll have to see.
-        let mut reader = NpzReader::new(&mut self.handle)?;
+        // The reader is kept around, so the archive index is only parsed once
+        // and not once per weight.
+        let reader = &mut self.reader;
 
         // checking for flat weights and reshaping
         let arr: Result<ArrayBase<_, D>, _> = reader.by_name(param_name);
@@ -135,4 +144,25 @@ mod tests {
 
         dir.close().unwrap();
     }
+
+    #[test]
+    fn test_compressed_npz_weight_loader() {
+        let dir = tempdir().unwrap();
+        let file_path = dir.path().join("temp-weights-compressed.npz");
+        let file = File::create(&file_path).unwrap();
+        let mut npz = ndarray_npy::NpzWriter::new_compressed(file);
+        let a: Array2<f32> = array![[1., 2., 3.], [4., 5., 6.]];
+        let b: Array1<f32> = array![7., 8., 9.];
+        npz.add_array("a", &a).unwrap();
+        npz.add_array("b", &b).unwrap();
+        npz.finish().unwrap();
+
+        let bytes = fs::read(&file_path).unwrap();
+        let mut loader = NpzWeightLoader::from_buffer(&bytes).unwrap();
+
+        assert_eq!(loader.get_weight::<_, _, f32>("b", 3).unwrap(), b);
+        assert_eq!(loader.get_weight::<_, _, f32>("a", (2, 3)).unwrap(), a);
+
+        dir.close().unwrap();
+    }
 }
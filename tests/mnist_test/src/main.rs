@@ -5,6 +5,8 @@ use ordered_float::NotNan;
 mod models;
 
 fn main() -> ExitCode {
+    // checks the manifest written on export, including the hashes of all weights
+    models::verify_weights::<f32, _>("weights.npz", true).unwrap();
     let mut loader = NpzWeightLoader::from_path("weights.npz").unwrap();
     let m: models::MnistClassifier<f32> = models::MnistClassifier::new(&mut loader);
 